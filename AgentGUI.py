@@ -1,7 +1,8 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import font
-import queue
+from collections import deque
+from chat_render import insert_arguments, parse_markdown
 
 # --- Constants for easy color management ---
 PRIMARY_COLOR = "#007ACC"
@@ -29,11 +30,24 @@ SCROLLBAR_KNOB = "#555555"
 SCROLLBAR_KNOB_ACTIVE = "#676767"
 ARROW_COLOR = "#999999"
 
+# --- Chat history kept in the text area (older messages are shown on request) ---
+MAX_VISIBLE_MESSAGES = 100
+HISTORY_PAGE = 50
+
 
 class ChatWindow(tk.Toplevel):
     def __init__(self, master, pos_x, pos_y, on_send_callback, on_close_callback, on_minimize_callback):
         super().__init__(master)
         self.is_ai_thinking = False
+        # Sender of the message currently being streamed in, if any
+        self.streaming_sender = None
+        self.streaming_text = ""
+        # Every complete message as (sender, spans); only the last `visible_limit` are kept in the text area
+        self.history = []
+        self.visible_from = 0
+        self.visible_limit = MAX_VISIBLE_MESSAGES
+        self.message_marks = deque()
+        self.message_count = 0
         self.on_send_callback = on_send_callback
         self.on_close_callback = on_close_callback
         self.on_minimize_callback = on_minimize_callback
@@ -79,8 +93,17 @@ class ChatWindow(tk.Toplevel):
         self.text_area = tk.Text(conversation_frame, bg=CHAT_BG, fg="white", font=("Arial", 12), wrap="word", relief="flat", state="disabled", yscrollcommand=self.scrollbar.set)
         self.scrollbar.config(command=self.text_area.yview)
         
-        # Add the tag configuration AFTER the text_area is created
+        # Add the tag configuration AFTER the text_area is created (once, not per message)
         self.text_area.tag_configure("italic", font=font.Font(slant="italic"))
+        self.text_area.tag_configure("bold", font=font.Font(weight="bold"))
+        self.text_area.tag_configure("bullet", lmargin1=15, lmargin2=30)
+        sender_font = font.Font(family="Arial", size=12, weight="bold")
+        self.text_area.tag_configure("ai_sender", font=sender_font, foreground=AI_SENDER_COLOR)
+        self.text_area.tag_configure("user_sender", font=sender_font, foreground=USER_SENDER_COLOR)
+        self.text_area.tag_configure("earlier", foreground=ARROW_COLOR, underline=True)
+        self.text_area.tag_bind("earlier", "<Button-1>", self.show_earlier_messages)
+        self.text_area.tag_bind("earlier", "<Enter>", lambda e: self.text_area.config(cursor="hand2"))
+        self.text_area.tag_bind("earlier", "<Leave>", lambda e: self.text_area.config(cursor=""))
 
         self.scrollbar.pack(side="right", fill="y")
         self.text_area.pack(side="left", fill="both", expand=True)
@@ -112,61 +135,39 @@ class ChatWindow(tk.Toplevel):
         if self.focus_get() is None:
             self.minimize_window()
 
-    def insert_with_bold(self, text_area, line):
-        import re
-        pattern = r"\*\*(.*?)\*\*"  # matches **bold**
-        idx = 0
-        for match in re.finditer(pattern, line):
-            start, end = match.span()
-            # Insert text before bold part
-            if start > idx:
-                text_area.insert(tk.END, line[idx:start])
-            # Insert bold part
-            bold_text = match.group(1)
-            text_area.insert(tk.END, bold_text, "bold")
-            idx = end
-        # Insert remaining text
-        if idx < len(line):
-            text_area.insert(tk.END, line[idx:])
-
-    def format_message(self, text_area, message):
-        import re
-
-        # Define tag styles (ensure this is only done once in your init)
-        text_area.tag_configure("bold", font=font.Font(weight="bold"))
-        text_area.tag_configure("bullet", lmargin1=15, lmargin2=30)
-
-        # Split by lines to handle bullets
-        for line in message.splitlines():
-            # Match bullet points
-            if re.match(r"^\* ", line):
-                content = line[2:].strip()
-                text_area.insert(tk.END, "• ", "bullet")
-                self.insert_with_bold(text_area, content)
-                text_area.insert(tk.END, "\n")
-            else:
-                self.insert_with_bold(text_area, line)
-                text_area.insert(tk.END, "\n")
-
-    def add_message(self, sender, message):
+    def add_message(self, sender, message, append=False, spans=None):
+        """
+        Adds a message to the conversation. With `append=True` the text is added to the
+        sender's in-progress (streaming) message, which is started if needed. A regular call
+        from the same sender completes it: the streamed raw text is replaced by `message`,
+        formatted. `spans` is the message already parsed by `parse_markdown` (normally done
+        on the agent thread); it is parsed here if not given.
+        """
         # We must temporarily enable the text area to modify it
         self.text_area.config(state="normal")
 
-        # Now, add the new message from either the "You" or "AI"
-        sender_font = font.Font(family="Arial", size=12, weight="bold")
-        tag_name, color = ("ai_sender", AI_SENDER_COLOR) if sender == "AI" else ("user_sender", USER_SENDER_COLOR)
-        self.text_area.tag_configure(tag_name, font=sender_font, foreground=color)
-        
-        # We add a newline before the sender to ensure it's on a new line
-        self.text_area.insert(tk.END, f"\n{sender}: ", tag_name)
-        self.format_message(self.text_area, message)
+        if append:
+            if self.streaming_sender != sender:
+                self.discard_streaming_message()
+                self.start_streaming_message(sender)
+            # Raw text while streaming; markdown formatting is applied once the message is complete
+            self.streaming_text += message
+            self.text_area.insert(tk.END, message)
+            self.text_area.config(state="disabled")
+            self.text_area.see(tk.END)
+            return
+
+        if self.streaming_sender == sender:
+            self.discard_streaming_message()
+
+        if spans is None:
+            spans = parse_markdown(message)
+        self.history.append((sender, spans))
+        self.insert_message(sender, spans)
+        self.trim_messages()
 
         # Finally, update the state based on who sent the message.
-        if sender == "You":
-            # If the user just spoke, bracket the "thinking".
-            self.text_area.insert(tk.END, "\nAI is thinking...", ("ai_sender", "italic"))
-        
-        elif sender == "AI":
+        if sender == "AI":
             # If the AI just responded, the turn is over. Reset the state.
             self.is_ai_thinking = False
             self.send_button.config(bg=PRIMARY_COLOR)
@@ -175,6 +176,84 @@ class ChatWindow(tk.Toplevel):
         self.text_area.config(state="disabled")
         self.text_area.see(tk.END)
 
+    def insert_message(self, sender, spans):
+        """Inserts a complete message at the end with a single Text.insert call (the text area must be writable)."""
+        tag_name = "ai_sender" if sender == "AI" else "user_sender"
+        mark = f"message{self.message_count}"
+        self.message_count += 1
+        # The mark stays in front of the message; it is where the message is cut off when trimming
+        self.text_area.mark_set(mark, "end-1c")
+        self.text_area.mark_gravity(mark, "left")
+        self.message_marks.append(mark)
+        # We add a newline before the sender to ensure it's on a new line
+        arguments = [f"\n{sender}: ", tag_name, *insert_arguments(spans)]
+        if sender == "You":
+            # If the user just spoke, bracket the "thinking".
+            arguments += ["\nAI is thinking...", ("ai_sender", "italic")]
+        self.text_area.insert(tk.END, *arguments)
+
+    def trim_messages(self):
+        """Removes the oldest messages from the text area beyond the visible limit (the text area must be writable)."""
+        if len(self.message_marks) <= self.visible_limit:
+            return
+        while len(self.message_marks) > self.visible_limit:
+            self.text_area.mark_unset(self.message_marks.popleft())
+            self.visible_from += 1
+        self.text_area.delete("1.0", self.message_marks[0])
+        self.insert_earlier_banner()
+
+    def insert_earlier_banner(self):
+        """Puts the "show earlier messages" link at the top, in front of the first visible message."""
+        first_mark = self.message_marks[0] if self.message_marks else None
+        self.text_area.insert("1.0", f"▲ Show earlier messages ({self.visible_from} hidden)", "earlier")
+        if first_mark:
+            self.text_area.mark_set(first_mark, "earlier.last")
+
+    def show_earlier_messages(self, event=None):
+        """Brings back the previous page of messages that were trimmed from the text area."""
+        shown = min(HISTORY_PAGE, self.visible_from)
+        self.visible_from -= shown
+        self.visible_limit = max(self.visible_limit, len(self.history) - self.visible_from)
+        self.render_history()
+        if shown < len(self.message_marks):
+            self.text_area.see(self.message_marks[shown])
+        return "break"
+
+    def render_history(self):
+        """Redraws the text area from the message history (from `visible_from` on)."""
+        self.text_area.config(state="normal")
+        for mark in self.message_marks:
+            self.text_area.mark_unset(mark)
+        self.message_marks.clear()
+        self.text_area.delete("1.0", tk.END)
+        if self.visible_from:
+            self.insert_earlier_banner()
+        for sender, spans in self.history[self.visible_from:]:
+            self.insert_message(sender, spans)
+        if self.streaming_sender is not None:
+            streaming_text = self.streaming_text
+            self.start_streaming_message(self.streaming_sender)
+            self.streaming_text = streaming_text
+            self.text_area.insert(tk.END, streaming_text)
+        self.text_area.config(state="disabled")
+
+    def start_streaming_message(self, sender):
+        """Starts a streamed message at the end (the text area must be writable)."""
+        tag_name = "ai_sender" if sender == "AI" else "user_sender"
+        # The mark stays in front of the message while text is inserted after it
+        self.text_area.mark_set("streaming_message", "end-1c")
+        self.text_area.mark_gravity("streaming_message", "left")
+        self.text_area.insert(tk.END, f"\n{sender}: ", tag_name)
+        self.streaming_sender = sender
+        self.streaming_text = ""
+
+    def discard_streaming_message(self):
+        """Removes the in-progress streamed message, if any (the text area must be writable)."""
+        if self.streaming_sender is not None:
+            self.text_area.delete("streaming_message", tk.END)
+            self.streaming_sender = None
+            self.streaming_text = ""
+
     def start_move(self, event): self.x = event.x; self.y = event.y
     def stop_move(self, event): self.x = None; self.y = None
     def do_move(self, event): self.geometry(f"+{self.winfo_x() + event.x - self.x}+{self.winfo_y() + event.y - self.y}")
@@ -204,11 +283,13 @@ class ChatWindow(tk.Toplevel):
         self.destroy()
 
 class FloatingCircle(tk.Tk):
-    def __init__(self, input_queue, output_queue):
+    def __init__(self, input_queue, output_queue, screen_watcher=None):
         super().__init__()
         self.chat_window = None
         self.input_queue = input_queue
         self.output_queue = output_queue
+        # Optional background screen watcher; it only runs while the chat window is visible
+        self.screen_watcher = screen_watcher
         self.minimized_chat_icon = None # Start with no icon widget
 
         self.overrideredirect(True)
@@ -235,20 +316,37 @@ class FloatingCircle(tk.Tk):
         self.canvas.bind("<ButtonRelease-1>", self.stop_move)
         self.canvas.bind("<B1-Motion>", self.do_move)
         
-        self.process_incoming_messages()
+        # The agent thread wakes the Tk loop through a virtual event instead of being polled.
+        # event_generate may be called from other threads (tkinter forwards the call to the Tk thread).
+        self.render_scheduled = False
+        self.bind("<<AgentOutput>>", self.on_agent_output)
+        self.output_queue.attach(lambda: self.event_generate("<<AgentOutput>>", when="tail"))
+
+    def on_agent_output(self, event=None):
+        # Woken by the bridge when messages arrive; render at most once per frame
+        if not self.render_scheduled:
+            self.render_scheduled = True
+            self.after(int(self.output_queue.render_delay() * 1000), self.process_incoming_messages)
 
     def process_incoming_messages(self):
-        while not self.output_queue.empty():
-            try:
-                sender, message = self.output_queue.get(0)
-                if sender == "__EXIT__":
-                    self.quit_app()
-                    return
-                if self.chat_window and self.chat_window.winfo_exists():
+        self.render_scheduled = False
+        # Items are (sender, message), (sender, message, mode) for streamed text, or
+        # (sender, message, "parsed", spans) for messages already parsed on the agent thread
+        for sender, message, *mode in self.output_queue.drain():
+            if sender == "__EXIT__":
+                self.quit_app()
+                return
+            if self.chat_window and self.chat_window.winfo_exists():
+                if mode and mode[0] == "parsed":
+                    self.chat_window.add_message(sender, message, spans=mode[1])
+                elif mode == ["append"]:
+                    self.chat_window.add_message(sender, message, append=True)
+                elif mode == ["discard"]:
+                    self.chat_window.text_area.config(state="normal")
+                    self.chat_window.discard_streaming_message()
+                    self.chat_window.text_area.config(state="disabled")
+                else:
                     self.chat_window.add_message(sender, message)
-            except queue.Empty:
-                pass
-        self.after(100, self.process_incoming_messages)
 
     def handle_user_input(self, user_input):
         self.input_queue.put(user_input)
@@ -313,6 +411,8 @@ class FloatingCircle(tk.Tk):
         # Reset the chat window state and inform the agent
         self.chat_window = None
         self.input_queue.put("__RESET__")
+        if self.screen_watcher:
+            self.screen_watcher.pause()
 
     def handle_chat_minimize(self):
         if self.chat_window and self.chat_window.winfo_viewable():
@@ -321,6 +421,8 @@ class FloatingCircle(tk.Tk):
                 self.minimized_chat_icon = tk.Label(self, text="💬", bg=PRIMARY_COLOR, fg=BUTTON_BG_NORMAL, font=("Segoe UI Emoji", 18), cursor="hand2")
                 self.minimized_chat_icon.bind("<Button-1>", lambda e: self.restore_chat())
             self.minimized_chat_icon.place(x=35, y=65)
+        if self.screen_watcher:
+            self.screen_watcher.pause()
 
     def restore_chat(self):
         if self.chat_window:
@@ -341,6 +443,7 @@ class FloatingCircle(tk.Tk):
             self.chat_window.geometry(f"+{pos_x}+{pos_y}")
             self.chat_window.deiconify()
             self.chat_window.entry.focus_set()
+            self.resume_screen_watcher()
 
     def open_chat(self):
         # If chat window exists, just bring it to the front
@@ -371,6 +474,10 @@ class FloatingCircle(tk.Tk):
         # Send initial greeting and set focus
         self.output_queue.put(("AI", "Hello! How can I assist you today?"))
         self.chat_window.entry.focus_set()
+        if self.screen_watcher:
+            # Keep the watcher's idea of where our own windows are up to date as the chat moves
+            self.chat_window.bind("<Configure>", self.on_chat_configure, add="+")
+            self.resume_screen_watcher()
 
         # Correctly unpack all parts to update the button's appearance
         canvas, oval_id, text_id = self.write_button_info
@@ -379,6 +486,25 @@ class FloatingCircle(tk.Tk):
         canvas.itemconfig(oval_id, fill=BUTTON_BG_ACTIVE)
         canvas.itemconfig(text_id, fill=TEXT_COLOR_ACTIVE)
 
+    def own_window_regions(self):
+        """Screen boxes of the floating circle and the chat window, left out of screen-change detection."""
+        regions = [{"left": self.winfo_rootx(), "top": self.winfo_rooty(),
+                    "width": self.winfo_width(), "height": self.winfo_height()}]
+        if self.chat_window and self.chat_window.winfo_exists():
+            self.chat_window.update_idletasks()
+            regions.append({"left": self.chat_window.winfo_rootx(), "top": self.chat_window.winfo_rooty(),
+                            "width": self.chat_window.winfo_width(), "height": self.chat_window.winfo_height()})
+        return regions
+
+    def resume_screen_watcher(self):
+        if self.screen_watcher:
+            self.screen_watcher.resume(ignored_regions=self.own_window_regions())
+
+    def on_chat_configure(self, event):
+        # Configure events of child widgets bubble up to the toplevel; only its own moves matter
+        if event.widget is self.chat_window and self.screen_watcher:
+            self.screen_watcher.ignore_regions(self.own_window_regions())
+
     def speak_placeholder(self):
         if self.chat_window and self.chat_window.winfo_exists():
             self.output_queue.put(("System", "Voice input is not yet implemented."))
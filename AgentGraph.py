@@ -1,14 +1,27 @@
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, Annotated, Sequence
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, message_chunk_to_message
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode
-from agent_and_tools import all_tools, agent
+from agent_and_tools import all_tools, agent, reset_session, TOOL_CONCURRENCY, SERIAL_TOOLS
+from tool_executor import ConcurrentToolNode
+from conversation_history import HistoryManager
+from tracing import Tracer, TRACING_ENABLED
 
 # The state schema remains the same. `add_messages` is key.
 class MyState(TypedDict):
     messages: Annotated[Sequence, add_messages]
 
+def message_text(content):
+    """Text of a message's content, which can be a list of content blocks or a simple string."""
+    if isinstance(content, list):
+        # Join list items with a newline for better readability in the GUI
+        return "\n".join(
+            part.get('text', '') if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    # If it's already a string, use it directly (use str() for safety)
+    return str(content)
+
 def create_graph_app(output_queue):
     """
     Creates and compiles a new instance of the agent graph.
@@ -20,9 +33,33 @@ def create_graph_app(output_queue):
     # --- Graph Definition ---
     
     def process_node(state: MyState) -> MyState:
-        """Invokes the agent with the current conversation history."""
-        response = agent.invoke(state["messages"])
-        return {"messages": [response]}
+        """
+        Runs the agent on the current conversation history, streaming its text to the GUI
+        as it is generated (the final, formatted message is sent by `should_continue`).
+        """
+        response = None
+        streamed = False
+        try:
+            for chunk in agent.stream(state["messages"]):
+                response = chunk if response is None else response + chunk
+                delta = message_text(chunk.content)
+                if delta:
+                    output_queue.put(("AI", delta, "append"))
+                    streamed = True
+        except ValueError:
+            # LangChain raises this when the model streams no chunk at all; anything else is re-raised
+            if response is not None:
+                raise
+        if response is None:
+            # Ask again without streaming, so an empty stream does not end the agent thread
+            try:
+                return {"messages": [agent.invoke(state["messages"])]}
+            except Exception as e:
+                return {"messages": [AIMessage(content=f"Sorry, the model returned no response ({e}). Please try again.")]}
+        if streamed and response.tool_calls:
+            # Text streamed ahead of tool calls is only a preamble; the final answer replaces it
+            output_queue.put(("AI", "", "discard"))
+        return {"messages": [message_chunk_to_message(response)]}
 
     def should_continue(state: MyState):
         """
@@ -36,18 +73,9 @@ def create_graph_app(output_queue):
 
         # The final response from the LLM can be a list of content blocks or a simple string.
         # We must convert it to a single string before any further processing
-        final_content = ""
-        if isinstance(last_message.content, list):
-            # Join list items with a newline for better readability in the GUI
-            final_content = "\n".join(
-                part.get('text', '') if isinstance(part, dict) else str(part)
-                for part in last_message.content
-            )
-        else:
-            # If it's already a string, use it directly (use str() for safety)
-            final_content = str(last_message.content)
-
-        # If no tool call, send the agent's final answer to the GUI
+        final_content = message_text(last_message.content)
+
+        # If no tool call, send the agent's final answer to the GUI (it replaces the streamed text)
         output_queue.put(("AI", final_content))
 
         # Check for exit condition to terminate the entire application
@@ -59,7 +87,8 @@ def create_graph_app(output_queue):
     # Build the graph
     graph = StateGraph(MyState)
     graph.add_node("process_node", process_node)
-    graph.add_node("tools_node", ToolNode(all_tools))
+    # Independent tool calls of one step run concurrently; GUI / clipboard / file changes run serially
+    graph.add_node("tools_node", ConcurrentToolNode(all_tools, limits=TOOL_CONCURRENCY, serial=SERIAL_TOOLS))
     
     graph.set_entry_point("process_node")
     
@@ -91,7 +120,7 @@ def run_agent_loop(input_queue, output_queue):
 **Core Directive: The Screen is the Ground Truth**
 
 1.  **"Here" or "Current Folder" means the visual directory:** When the user refers to "here", "this folder", or "the current directory", they are ALWAYS referring to the folder path visible in the active window on their screen (e.g., in File Explorer, VS Code's file panel, or a terminal).
-2.  **Mandatory Visual Check:** Before executing ANY file system command (like `Create`, `Delete`, `Write`, `find_files`, `list_directory_tree`), you MUST first determine the current visual path.
+2.  **Mandatory Visual Check:** Before executing ANY file system command (like `Create`, `Delete`, `Write`, `find_files`, `list_directory_tree`), you MUST first determine the current visual path. Call `get_current_directory` for this: it reads the path from the active window and only falls back to looking at the screen when needed. Use `SeeScreen` (with `region="active_window"`) only if it cannot find the path.
 
 **Execution Logic for Sequential Commands**
 
@@ -112,6 +141,11 @@ def run_agent_loop(input_queue, output_queue):
     
     # Initialize conversation history
     conversation_history = [system_message]
+    # Keeps the history resent every turn within a token budget (old tool outputs go first)
+    history_manager = HistoryManager()
+    # Records every node, tool and LLM call of a turn to the local trace file (python tracing.py summarizes it)
+    tracer = Tracer() if TRACING_ENABLED else None
+    run_config = {"callbacks": [tracer]} if tracer else {}
     
     while True:
         # Wait for an input from the GUI's queue
@@ -122,6 +156,10 @@ def run_agent_loop(input_queue, output_queue):
         
         if user_input == "__RESET__":
             conversation_history = [system_message]
+            # Drop the documents indexed by ask_document and the stored tool outputs of the old session
+            reset_session()
+            if tracer:
+                tracer.new_session()
             # Pass the output_queue again when recompiling 
             app = create_graph_app(output_queue)
             continue
@@ -133,7 +171,8 @@ def run_agent_loop(input_queue, output_queue):
         conversation_history.append(HumanMessage(content=user_input))
         
         # Invoke the graph with the full conversation history
-        result = app.invoke({"messages": conversation_history})
+        result = app.invoke({"messages": conversation_history}, config=run_config)
         
-        # Update our persistent history with the new state for the next turn.
-        conversation_history = result['messages']
+        # Update our persistent history with the new state for the next turn,
+        # compacted so the prompt does not grow with the length of the session.
+        conversation_history = history_manager.compact(result['messages'])
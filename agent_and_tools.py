@@ -1,40 +1,43 @@
+from tool_registry import timed, lazy_import, lazy_resource, start_warm_up
+from document_index import DocumentIndex
+from embedding_cache import CachedEmbeddings
+from embedding_engine import EmbeddingEngine
+from summarizer import MapReduceSummarizer
+from extractors import SUPPORTED_EXTENSIONS, extract_text, parse_ranges
+from extraction_cache import ExtractionCache
+from file_index import FileIndex
+from content_index import ContentIndex, MAX_INDEXED_CHARS
+from screen_capture import ScreenDescriptionCache, grab_screen, frame_signature, parse_region, encode_for_vision
+from screen_watcher import ScreenWatcher
+from tool_output import BlobStore, OutputGovernor
+from window_path import CurrentDirectoryResolver, parse_window_title, explorer_folder, window_process_id, terminal_cwd
+from response_cache import ResponseCache, CACHE_ENABLED
+
+# Only light imports happen eagerly; tool schemas need nothing more than these.
+# Heavy dependencies are loaded on first use (or by the background warm-up) via lazy_import.
+with timed("module: langchain_core"):
+    from langchain_core.tools import tool
+    from langchain_core.messages import HumanMessage, SystemMessage
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.runnables import RunnablePassthrough
+    from langchain_core.prompts import PromptTemplate
+with timed("module: langchain_google_genai"):
+    from langchain_google_genai import ChatGoogleGenerativeAI
+with timed("module: langchain_community.tools"):
+    from langchain_community.tools import TavilySearchResults
 import os
 import shutil
 import pyperclip
-import pyautogui
 from datetime import datetime
-from langchain_core.tools import tool
-from langchain_community.tools import TavilySearchResults
 import platform
 import socket
-import base64
 import getpass
 from io import BytesIO
-from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, SystemMessage
 import subprocess
-import glob
 import zipfile
-from PIL import Image
 import re
-from tavily import TavilyClient
-import mss
-import pygetwindow as gw
-import pypdf
-import docx
-import openpyxl
-import requests
-from bs4 import BeautifulSoup
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.prompts import PromptTemplate
-from docx import Document
-from fpdf import FPDF
-import pandas as pd
+from functools import partial
 
 
 
@@ -46,6 +49,11 @@ llm = ChatGoogleGenerativeAI(
     temperature = 0
 )
 
+# The tools' own LLM calls (summaries, ask_document answers, screen descriptions) go through a
+# copy of the model with a response cache; the agent's reasoning steps are never cached
+llm_cache = ResponseCache()
+tool_llm = llm.model_copy(update={"cache": llm_cache}) if CACHE_ENABLED else llm
+
 @tool
 def get_username() -> str:
     """
@@ -81,40 +89,36 @@ def get_clipboard_content() -> str:
     except Exception as e:
         return f"Error reading from clipboard: {str(e)}"
 
+# Local file system index shared by list_directory_tree and find_files (see file_index.py)
+file_index = FileIndex()
+
+def _changed(*paths):
+    """Tells the file index which folders a tool just changed, so the next find / listing sees it."""
+    file_index.invalidate(*paths)
+
 @tool
-def list_directory_tree(path: str, depth: int = 0) -> str:
+def list_directory_tree(path: str, depth: int = 0, max_entries: int = 500, max_per_dir: int = 100) -> str:
     """
     Returns the folder and file tree of a given directory up to a specified depth.
+    Folders such as .git, node_modules and __pycache__ are shown but not expanded, and
+    large folders are summarized so the output stays small.
 
     Args:
         path: The root directory path to explore.
         depth: How many levels deep to explore (default: 0).
+        max_entries: Maximum number of lines to return (default: 500).
+        max_per_dir: Maximum number of entries shown per folder before summarizing the rest (default: 100).
     """
-    tree_lines = []
-
-    def walk(current_path, current_depth):
-        if current_depth > depth:
-            return
-        try:
-            items = os.listdir(current_path)
-        except (PermissionError, FileNotFoundError):
-            return
-        for item in items:
-            item_path = os.path.join(current_path, item)
-            tree_lines.append("  " * current_depth + f"- {item}")
-            if os.path.isdir(item_path):
-                walk(item_path, current_depth + 1)
-
     if not os.path.exists(path):
         return f"Path does not exist: {path}"
     if not os.path.isdir(path):
         return f"Path is not a directory: {path}"
 
-    walk(path, 0)
-    return "\n".join(tree_lines)
+    # Directories are listed in parallel through the shared file index
+    return file_index.render_tree(path, depth, max_entries=max_entries, max_per_dir=max_per_dir)
 
 @tool
-def find_files(start_dir: str, pattern: str) -> str:
+def find_files(start_dir: str, pattern: str = None, contains: str = None, extension: str = None) -> str:
     """
     Finds files matching a specific pattern within a directory and its subdirectories.
 
@@ -122,20 +126,74 @@ def find_files(start_dir: str, pattern: str) -> str:
         start_dir: The directory to start the search from.
         pattern: The search pattern to match (e.g., '*.txt', 'report.*', 'image_?.png').
                  Uses standard glob patterns.
+        contains: Optional case-insensitive text that the file name must contain (e.g., 'invoice').
+        extension: Optional file extension to filter by (e.g., '.pdf').
 
     Returns:
         A string listing the matching file paths, or a message if none are found.
     """
     try:
-        # Use recursive glob to find all matching files
-        results = glob.glob(os.path.join(start_dir, f"**/{pattern}"), recursive=True)
+        if not (pattern or contains or extension):
+            return "Error: Provide at least one of 'pattern', 'contains' or 'extension'."
+        # Answered from the incrementally refreshed file index instead of re-walking the disk
+        results = file_index.find(start_dir, pattern=pattern, contains=contains, extension=extension)
         if not results:
-            return f"No files found matching '{pattern}' in '{start_dir}'."
+            criteria = ", ".join(f"{name}='{value}'" for name, value in
+                                 (("pattern", pattern), ("contains", contains), ("extension", extension)) if value)
+            return f"No files found matching {criteria} in '{start_dir}'."
         
         return "Found files:\n" + "\n".join(results)
     except Exception as e:
         return f"An error occurred while searching for files: {str(e)}"
 
+def _indexable_files(root):
+    """Every file under root that Read can extract, taken from the shared file index."""
+    return [found for extension in SUPPORTED_EXTENSIONS
+            for found in file_index.find(root, extension=extension)]
+
+# Persistent full-text index over document contents, built with the same extractors as Read
+content_index = ContentIndex(
+    extract=lambda full_path: extract_text(full_path, max_chars=MAX_INDEXED_CHARS)[0],
+    list_files=_indexable_files
+)
+
+@tool
+def search_file_contents(directory: str, query: str, max_results: int = 10) -> str:
+    """
+    Searches inside the documents (.txt, .pdf, .docx, .xlsx, .xlsm) of a directory and its
+    subdirectories and returns the files whose content best matches the query, each with a snippet.
+
+    Use this instead of reading files one by one when you need to find which file mentions
+    something. The index is kept on disk and only new or changed files are re-read.
+
+    Args:
+        directory: The directory to search in.
+        query: The words to look for (files containing all words rank first).
+        max_results: Maximum number of files to return (default: 10).
+
+    Returns:
+        A ranked list of matching file paths with snippets, or a message if nothing matches.
+    """
+    try:
+        if not os.path.isdir(directory):
+            return f"Path is not a directory: {directory}"
+
+        indexed, removed, pending = content_index.update(directory)
+        results = content_index.search(query, root=directory, limit=max_results)
+
+        notes = []
+        if pending:
+            notes.append(f"Note: {pending} files are not indexed yet; search again to include them.")
+        if not results:
+            return "\n".join([f"No documents in '{directory}' mention '{query}'."] + notes)
+
+        lines = [f"Found {len(results)} matching document(s):"]
+        for rank, (path, snippet, _) in enumerate(results, start=1):
+            lines.append(f"{rank}. {path}\n   {' '.join(snippet.split())}")
+        return "\n".join(lines + notes)
+    except Exception as e:
+        return f"An error occurred while searching file contents: {str(e)}"
+
 @tool
 def Create(path: str, name: str) -> str:
     """
@@ -154,10 +212,12 @@ def Create(path: str, name: str) -> str:
             # It's a file
             with open(full_path, 'w') as f:
                 pass
+            _changed(path, os.path.dirname(full_path))
             return f"File created: {full_path}"
         else:
             # It's a folder
             os.makedirs(full_path, exist_ok=True)
+            _changed(path, os.path.dirname(full_path))
             return f"Folder created: {full_path}"
     except Exception as e:
         return f"Error: {str(e)}"
@@ -175,9 +235,11 @@ def Delete(path: str, name: str) -> str:
         target = os.path.join(path, name)
         if os.path.isfile(target):
             os.remove(target)
+            _changed(os.path.dirname(target))
             return f"File deleted: {target}"
         elif os.path.isdir(target):
             shutil.rmtree(target)
+            _changed(os.path.dirname(target))
             return f"Folder deleted: {target}"
         else:
             return "Item not found at specified path."
@@ -198,6 +260,7 @@ def Move(source: str, destination: str, name: str) -> str:
         source_path = os.path.join(source, name)
         destination_path = os.path.join(destination, name)
         shutil.move(source_path, destination_path)
+        _changed(os.path.dirname(source_path), os.path.dirname(destination_path))
         return f"Moved to: {destination_path}"
     except Exception as e:
         return f"Error: {str(e)}"
@@ -216,6 +279,7 @@ def Rename(path: str, old_name: str, new_name: str) -> str:
         old_path = os.path.join(path, old_name)
         new_path = os.path.join(path, new_name)
         os.rename(old_path, new_path)
+        _changed(os.path.dirname(old_path), os.path.dirname(new_path))
         return f"Renamed to: {new_path}"
     except Exception as e:
         return f"Error: {str(e)}"
@@ -253,13 +317,13 @@ def Write(path: str, file_name: str, content: str) -> str:
                 f.write(content)
 
         elif ext == '.docx':
-            doc = Document()
+            doc = lazy_import("docx").Document()
             for line in content.splitlines():
                 doc.add_paragraph(line)
             doc.save(full_path)
 
         elif ext == '.pdf':
-            pdf = FPDF()
+            pdf = lazy_import("fpdf").FPDF()
             pdf.add_page()
             pdf.set_auto_page_break(auto=True, margin=15)
             pdf.set_font("Arial", size=12)
@@ -268,32 +332,45 @@ def Write(path: str, file_name: str, content: str) -> str:
             pdf.output(full_path)
 
         elif ext == '.xlsx':
+            pd = lazy_import("pandas")
             df = pd.DataFrame([line.split('\t') for line in content.splitlines()])
             df.to_excel(full_path, index=False, header=False)
 
         else:
             return "Unsupported file type."
 
+        # The folder may have been created just now, which changes its parent too
+        _changed(path, os.path.dirname(os.path.abspath(path)))
         return f"Content written to: {full_path}"
 
     except Exception as e:
         return f"Error writing file: {str(e)}"
 
+# Extraction results keyed on (path, size, mtime_ns, requested range); see extraction_cache.py
+extraction_cache = ExtractionCache()
+
 @tool
-def Read(path: str, file_name: str) -> str:
+def Read(path: str, file_name: str, pages: str = None, sheets: str = None, rows: str = None,
+         excel_format: str = "text", max_chars: int = None) -> str:
     """
     Reads and extracts the text content from various file types, including plain text,
     PDF, Microsoft Word (.docx), and Microsoft Excel (.xlsx, xlsm).
 
     This tool automatically detects the file type based on its extension and uses the
-    appropriate method to extract all readable text.
+    appropriate method to extract all readable text. For large files, read only what you
+    need with `pages`, `sheets` or `max_chars` instead of the whole file.
 
     Args:
         path: The directory where the file is located.
         file_name: The name of the file (including its extension, e.g., 'report.pdf').
+        pages: Optional 1-based pages to read for PDFs (paragraphs for .docx), e.g. '1-10' or '1-3,7'.
+        sheets: Optional comma-separated Excel sheet names to read (default: all sheets).
+        rows: Optional 1-based Excel row range to read from each sheet, e.g. '1-100'.
+        excel_format: Layout of Excel rows: 'text' (space separated values, default), 'tsv' or 'csv'.
+        max_chars: Optional maximum number of characters to return; extraction stops once reached.
 
     Returns:
-        A string containing all the extracted text from the file.
+        A string containing the extracted text from the file.
         Returns an error message if the file is not found or the format is unsupported.
     """
 
@@ -302,43 +379,20 @@ def Read(path: str, file_name: str) -> str:
         _, extension = os.path.splitext(file_name)
         extension = extension.lower()
 
-        content = ""
-
-        # Handle PDF files
-        if extension == '.pdf':
-            with open(full_path, 'rb') as f:
-                reader = pypdf.PdfReader(f)
-                for page in reader.pages:
-                    content += page.extract_text() or ''
-            return content
-
-        # Handle Word documents
-        elif extension == '.docx':
-            doc = docx.Document(full_path)
-            for para in doc.paragraphs:
-                content += para.text + '\n'
-            return content
-
-        # Handle Excel files - reads all cells from all sheets
-        elif extension in ['.xlsx', '.xlsm']:
-            workbook = openpyxl.load_workbook(full_path)
-            for sheet_name in workbook.sheetnames:
-                sheet = workbook[sheet_name]
-                for row in sheet.iter_rows():
-                    for cell in row:
-                        if cell.value is not None:
-                            content += str(cell.value) + ' '
-                    content += '\n'
-            return content
-        
-        # Handle plain text files as the default
-        elif extension == '.txt':
-            with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
-                return f.read()
-        
-        else:
+        if extension not in SUPPORTED_EXTENSIONS:
             return "Unsupported file type."
 
+        sheet_names = [name.strip() for name in sheets.split(",")] if sheets else None
+        # Repeated reads of an unchanged file (same range) are answered from the extraction cache
+        content, truncated = extraction_cache.get_or_extract(
+            full_path, extract_text,
+            pages=parse_ranges(pages), sheets=sheet_names, max_chars=max_chars,
+            rows=parse_ranges(rows), output_format=excel_format
+        )
+        if truncated:
+            content += f"\n\n[Truncated after {max_chars} characters. Use 'pages', 'sheets' or a larger 'max_chars' to read more.]"
+        return content
+
     except FileNotFoundError:
         return f"Error: The file '{full_path}' was not found."
     except Exception as e:
@@ -396,8 +450,11 @@ def GetSystemInfo() -> str:
             Processor: {platform.processor()}, \
             Hostname: {socket.gethostname()}"
 
+# Vision answers reused while the screen stays the same (thresholds: STEPWISE_SCREEN_* env vars)
+screen_cache = ScreenDescriptionCache()
+
 @tool
-def SeeScreen(ScreenFocus: str = None) -> str:
+def SeeScreen(ScreenFocus: str = None, region: str = "screen") -> str:
     """
     Analyzes the screen content using an optimized, high-speed capture method.
     
@@ -414,58 +471,83 @@ def SeeScreen(ScreenFocus: str = None) -> str:
                                      within the screenshot. If not provided, a 
                                      general description of the screen will be 
                                      returned. Example: "What is the error message?"
+        region (str, optional): What to capture. "screen" (default) for the whole primary
+                                monitor, "active_window" for only the focused window (faster,
+                                and enough to read the current folder path), or "x,y,width,height"
+                                for a specific rectangle in screen pixels.
 
     Returns:
         A rich textual description of the screen or a direct answer to the ScreenFocus question.
     """
     try:
-        # OPTIMIZATION 1: Use the ultra-fast mss library for screen capture
-        with mss.mss() as sct:
-            # Get a raw BGRA buffer of the primary monitor
-            sct_img = sct.grab(sct.monitors[1])
-            # Convert the raw BGRA data to a Pillow Image object
-            screenshot = Image.frombytes("RGB", sct_img.size, sct_img.bgra, "raw", "BGRX")
-
-        # OPTIMIZATION 2: Resize the image if it's larger than 1080p
-        max_size = (1920, 1080)
-        screenshot.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-        # Convert screenshot to base64 data URL (in-memory)
-        buffered = BytesIO()
-        # OPTIMIZATION 3: Save as JPEG for smaller file size
-        screenshot.save(buffered, format="JPEG", quality=90) # Quality set to 90
-        img_base64 = base64.b64encode(buffered.getvalue()).decode("utf-8")
-        data_url = f"data:image/jpeg;base64,{img_base64}"
-
-        # Conditionally create the prompt based on whether a focus is provided
-        if ScreenFocus:
-            system_text = (
-                "You are an expert visual assistant. The user has a specific question about the attached screenshot. "
-                "Analyze the image and answer their question directly and concisely. Do not describe what you see unless it's the answer. Just provide the answer."
-            )
-        else:
-            system_text = (
-                "You are an expert visual assistant. Analyze the following screenshot and provide a clear, structured "
-                "description of what is visible. Mention any open applications, UI components, readable text, and "
-                "overall screen layout. Be as detailed and organized as possible to help another agent understand "
-                "what the user is currently seeing."
-            )
-        
-        system_message = SystemMessage(content=system_text)
-        
-        human_content = []
-        if ScreenFocus:
-            human_content.append({"type": "text", "text": ScreenFocus})
-        human_content.append({"type": "image_url", "image_url": data_url})
-        
-        human_message = HumanMessage(content=human_content)
-
-        # Send the structured messages to Gemini and return the description
-        response = llm.invoke([system_message, human_message])
-        return response.content
+        # OPTIMIZATION 1: Use the ultra-fast mss library, capturing only the requested region
+        screenshot = grab_screen(parse_region(region))
+
+        # If the screen has not changed since the last call with the same focus, reuse that answer
+        cache_key = f"{region}|{ScreenFocus or ''}"
+        signature = frame_signature(screenshot)
+        if cache_key == WATCHED_SCREEN_KEY:
+            # If the watcher is describing this very frame, its answer is about to land in the cache
+            screen_watcher.wait_for(signature, timeout=30)
+        cached = screen_cache.get(cache_key, signature)
+        if cached is not None:
+            return cached
+
+        description = _describe_screenshot(screenshot, ScreenFocus)
+        screen_cache.put(cache_key, signature, description)
+        return description
     except Exception as e:
         return f"An error occurred while analyzing the screen: {str(e)}"
 
+def _describe_screenshot(screenshot, ScreenFocus=None):
+    """Sends the screenshot (and the optional focus question) to the vision model and returns its answer."""
+    # OPTIMIZATION 2: Pick resolution and JPEG quality to stay near the target payload size
+    data_url, _ = encode_for_vision(screenshot)
+
+    # Conditionally create the prompt based on whether a focus is provided
+    if ScreenFocus:
+        system_text = (
+            "You are an expert visual assistant. The user has a specific question about the attached screenshot. "
+            "Analyze the image and answer their question directly and concisely. Do not describe what you see unless it's the answer. Just provide the answer."
+        )
+    else:
+        system_text = (
+            "You are an expert visual assistant. Analyze the following screenshot and provide a clear, structured "
+            "description of what is visible. Mention any open applications, UI components, readable text, and "
+            "overall screen layout. Be as detailed and organized as possible to help another agent understand "
+            "what the user is currently seeing."
+        )
+    
+    system_message = SystemMessage(content=system_text)
+    
+    human_content = []
+    if ScreenFocus:
+        human_content.append({"type": "text", "text": ScreenFocus})
+    human_content.append({"type": "image_url", "image_url": data_url})
+    
+    human_message = HumanMessage(content=human_content)
+
+    # Send the structured messages to Gemini and return the description
+    response = tool_llm.invoke([system_message, human_message])
+    return response.content
+
+# The watcher precomputes the plain full-screen description, i.e. SeeScreen() without arguments
+WATCHED_SCREEN_KEY = "screen|"
+
+def _watch_capture():
+    screenshot = grab_screen()
+    return screenshot, frame_signature(screenshot)
+
+def _watch_describe(screenshot, signature):
+    # A static screen keeps its description fresh instead of being described again when it expires
+    if screen_cache.touch(WATCHED_SCREEN_KEY, signature):
+        return False
+    screen_cache.put(WATCHED_SCREEN_KEY, signature, _describe_screenshot(screenshot))
+    return True
+
+# Optional (STEPWISE_SCREEN_WATCHER=1): resumed by the GUI while the chat window is open
+screen_watcher = ScreenWatcher(_watch_capture, _watch_describe)
+
 @tool
 def get_active_window_title() -> str:
     """
@@ -481,7 +563,7 @@ def get_active_window_title() -> str:
         A string containing the title of the active window, or a message if none is found.
     """
     try:
-        active_window = gw.getActiveWindow()
+        active_window = lazy_import("pygetwindow").getActiveWindow()
         if active_window:
             return f"The current active window is: '{active_window.title}'"
         else:
@@ -491,6 +573,59 @@ def get_active_window_title() -> str:
         # This can happen if the window closes while the function is running
         return f"An error occurred while getting the active window title: {str(e)}"
 
+def _directory_from_title():
+    active_window = lazy_import("pygetwindow").getActiveWindow()
+    match = parse_window_title(active_window.title) if active_window else None
+    return match[0] if match else None
+
+def _directory_from_explorer():
+    active_window = lazy_import("pygetwindow").getActiveWindow()
+    if not active_window or platform.system() != "Windows":
+        return None
+    return explorer_folder(active_window._hWnd)
+
+def _directory_from_terminal():
+    active_window = lazy_import("pygetwindow").getActiveWindow()
+    if not active_window or platform.system() != "Windows":
+        return None
+    pid = window_process_id(active_window._hWnd)
+    return terminal_cwd(pid) if pid else None
+
+def _directory_from_screen():
+    answer = SeeScreen.invoke({
+        "ScreenFocus": "What is the full folder path shown in this window (address bar, title, prompt or file panel)? "
+                       "Answer with the path only, or 'unknown'.",
+        "region": "active_window",
+    })
+    match = parse_window_title(answer)
+    return match[0] if match else None
+
+# Cheapest first: the vision model is only asked when the title and OS queries give nothing
+directory_resolver = CurrentDirectoryResolver([
+    ("window_title", _directory_from_title),
+    ("explorer_window", _directory_from_explorer),
+    ("terminal_process", _directory_from_terminal),
+    ("screen", _directory_from_screen),
+])
+
+@tool
+def get_current_directory() -> str:
+    """
+    Finds the folder the user is currently looking at (the "here" / "this folder" of a request).
+
+    It reads the active window title (File Explorer, terminals and editors often show the path),
+    then asks the OS (the open File Explorer folder, a terminal's working directory), and only
+    as a last resort analyzes the active window with SeeScreen. Use this instead of SeeScreen
+    whenever you just need the current folder path.
+
+    Returns:
+        The absolute path of the current folder and how it was found, or a message if it could not be determined.
+    """
+    path, strategy = directory_resolver.resolve()
+    if path:
+        return f"The current directory is: {path} (found via {strategy.replace('_', ' ')})"
+    return "Could not determine the current directory from the active window or the screen. Ask the user for the path."
+
 @tool
 def execute_shell_command(command: str) -> str:
     """
@@ -557,6 +692,7 @@ def zip_files(source_path: str, output_zip_path: str) -> str:
                         zipf.write(file_path, arcname=arcname)
             else: # It's a single file
                 zipf.write(source_path, arcname=os.path.basename(source_path))
+        _changed(os.path.dirname(os.path.abspath(output_zip_path)))
         return f"Successfully created zip file: {output_zip_path}"
     except Exception as e:
         return f"Error creating zip file: {str(e)}"
@@ -577,6 +713,7 @@ def unzip_file(zip_path: str, destination_dir: str) -> str:
         os.makedirs(destination_dir, exist_ok=True)
         with zipfile.ZipFile(zip_path, 'r') as zipf:
             zipf.extractall(destination_dir)
+        _changed(destination_dir, os.path.dirname(os.path.abspath(destination_dir)))
         return f"Successfully extracted '{zip_path}' to '{destination_dir}'."
     except Exception as e:
         return f"Error extracting zip file: {str(e)}"
@@ -597,13 +734,40 @@ def type_on_screen(text_to_type: str, interval_seconds: float = 0.05) -> str:
         A success message.
     """
     try:
-        pyautogui.write(text_to_type, interval=interval_seconds)
+        lazy_import("pyautogui").write(text_to_type, interval=interval_seconds)
         return "Text typed successfully."
     except Exception as e:
         return f"An error occurred while typing: {str(e)}"
 
-# Create embeddings
-embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# Create embeddings (the model is loaded on first use or by the warm-up thread).
+# Vectors are cached on disk by chunk-content hash, so repeated documents are not re-embedded;
+# hit/miss counters are available through get_embeddings().stats().
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Chunks missing from the cache go through the batched, parallel EmbeddingEngine
+# (batch size / threads / processes are tuned with the STEPWISE_EMBED_* environment variables).
+@lazy_resource(f"HuggingFaceEmbeddings {EMBEDDING_MODEL}")
+def get_embeddings():
+    HuggingFaceEmbeddings = lazy_import("langchain_community.embeddings").HuggingFaceEmbeddings
+    engine = EmbeddingEngine(
+        HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL),
+        model_factory=partial(HuggingFaceEmbeddings, model_name=EMBEDDING_MODEL)
+    )
+    # With STEPWISE_EMBED_PROCESSES set, the worker processes load their models in the background now
+    engine.warm_up()
+    return CachedEmbeddings(engine, EMBEDDING_MODEL)
+
+# Documents indexed during the current chat session; dropped on "__RESET__"
+session_index = DocumentIndex(get_embeddings)
+
+# Large tool outputs of the session, referenced by handles instead of being passed through the LLM
+tool_outputs = BlobStore()
+
+def reset_session():
+    """Drops every document indexed by ask_document and every stored tool output of the current session."""
+    session_index.reset()
+    tool_outputs.clear()
+
 @tool
 def ask_document(content: str, query: str) -> str:
     """
@@ -614,7 +778,8 @@ def ask_document(content: str, query: str) -> str:
     tool's output. It does not use external knowledge.
 
     Args:
-        content: The text content (the "document") to be analyzed and queried.
+        content: The text content (the "document") to be analyzed and queried, or the handle
+                 (e.g. "blob:1a2b3c4d5e6f") of a large tool output that was stored instead of shown.
         query: The specific question to "ask" the document.
 
     Returns:
@@ -622,48 +787,43 @@ def ask_document(content: str, query: str) -> str:
         Returns an error message if the content is too short or an analysis cannot be performed.
     """
 
+    try:
+        content = tool_outputs.resolve(content)
+    except KeyError as e:
+        return f"Error: {e.args[0]} Run the tool again to get its output."
+
     if not content or not content.strip():
         return "Error: The provided content is empty. Cannot perform analysis."
 
-    # 1. Split the document into chunks
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    docs = text_splitter.create_documents([content])
-
-    # 2. Create an in-memory vector store from the chunks
-    vectorstore = Chroma.from_documents(
-        documents=docs, 
-        embedding=embeddings
-    )
+    # 1. Index the document once per session (split + embed); later questions only retrieve
+    doc_id = session_index.add(content)
 
-    # 3. Create a retriever from the vector store
-    retriever = vectorstore.as_retriever(
-        search_kwargs={"k": 3},  # Retrieve top 3 chunks
-        search_type = "similarity_score_threshold"
-    )
+    # 2. Create a retriever restricted to this document's chunks
+    retriever = session_index.as_retriever(doc_id, k=3)  # Retrieve top 3 chunks
 
-    # 4. Define the RAG prompt template
+    # 3. Define the RAG prompt template
     prompt = PromptTemplate.from_template("""Answer the question based only on the following context:
         {context}
 
         Question: {question}
         """)
     
-    # 5. Create the RAG chain using LangChain Expression Language (LCEL)
+    # 4. Create the RAG chain using LangChain Expression Language (LCEL)
     rag_chain = (
         {"context": retriever, "question": RunnablePassthrough()}
         | prompt
-        | llm
+        | tool_llm
         | StrOutputParser()
     )
     
-    # 6. Invoke the chain with the query to get the answer
+    # 5. Invoke the chain with the query to get the answer
     answer = rag_chain.invoke(query)
 
-    # Clean up the in-memory vector store
-    vectorstore.delete_collection()
-
     return answer
 
+# Chooses between single-shot and map-reduce summarization based on the content size
+summarizer = MapReduceSummarizer(tool_llm)
+
 @tool
 def summarize_content(content: str) -> str:
     """
@@ -672,42 +832,26 @@ def summarize_content(content: str) -> str:
     This tool is highly effective for condensing long articles, documents, reports,
     or any other substantial piece of text into its key points. Use it when you
     need to understand the main ideas of a text without reading it in its entirety.
+    Very long content is summarized section by section in parallel and then combined.
 
     Args:
-        content: The string of text that you want to summarize.
+        content: The string of text that you want to summarize, or the handle
+                 (e.g. "blob:1a2b3c4d5e6f") of a large tool output that was stored instead of shown.
 
     Returns:
         A string containing a clear and concise summary of the input content.
     """
 
+    try:
+        content = tool_outputs.resolve(content)
+    except KeyError as e:
+        return f"Error: {e.args[0]} Run the tool again to get its output."
+
     if not content or not content.strip():
         return "Error: The provided content is empty and cannot be summarized."
 
-    # Define prompt template
-    prompt = PromptTemplate.from_template("""
-    You are an expert summarization engine. Your task is to provide a clear and concise summary of the following content.
-
-    Focus on extracting the main ideas, key arguments, and any important conclusions.
-    Present the summary in a way that is easy to read and understand.
-
-    Content to summarize:
-    ---
-    {content}
-    ---
-
-    Concise Summary:
-    """)
-    
-    # Create the summarization chain using LangChain Expression Language (LCEL)
-    summarizer_chain = (
-        {"content": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
-    
-    # Invoke the chain with the content to get the summary
-    summary = summarizer_chain.invoke(content)
+    # Short content is summarized in one call; long content goes through chunked map-reduce
+    summary, _ = summarizer.summarize(content)
 
     return summary
 
@@ -734,12 +878,13 @@ def SmartWebScraper(link: str) -> str:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
 
+        requests = lazy_import("requests")
         # Automatically detect and use system-configured proxies
         proxies = requests.utils.getproxies()
         response = requests.get(link, headers=headers, proxies=proxies, timeout=10)
         
         response.raise_for_status()  # Raise an exception for bad status codes (e.g., 404 Not Found)
-        soup = BeautifulSoup(response.content, "html.parser")
+        soup = lazy_import("bs4").BeautifulSoup(response.content, "html.parser")
 
         tags_to_find = ["p", "h1", "h2", "h3", "h4", "h5", "h6", "code"]
         tags = soup.find_all(tags_to_find)
@@ -756,7 +901,9 @@ def SmartWebScraper(link: str) -> str:
         return f"Error scraping {link}: {str(e)}"
 
 
-tavily_client = TavilyClient()
+@lazy_resource("TavilyClient")
+def get_tavily_client():
+    return lazy_import("tavily").TavilyClient()
 
 @tool
 def download_image_by_description(description: str, folder_path: str, number_of_images: int = 1) -> str:
@@ -780,7 +927,9 @@ def download_image_by_description(description: str, folder_path: str, number_of_
     try:
         os.makedirs(folder_path, exist_ok=True)
 
-        results = tavily_client.search(
+        requests = lazy_import("requests")
+        Image = lazy_import("PIL.Image")
+        results = get_tavily_client().search(
             query=description,
             search_depth="advanced",
             include_images=True,
@@ -834,15 +983,57 @@ search_tool = TavilySearchResults(max_results=5)
 # Combine all tools
 all_tools = [get_username, GetSystemInfo, 
         Save_to_clipboard, get_clipboard_content, 
-        list_directory_tree, find_files, 
+        list_directory_tree, find_files, search_file_contents,
         Delete, Create, Move, Rename,
         Write, Read, zip_files, unzip_file, open_file_or_app,
         search_tool, download_image_by_description,
-        Current_time, SeeScreen, get_active_window_title, 
+        Current_time, SeeScreen, get_active_window_title, get_current_directory,
         execute_shell_command, 
         ask_document, summarize_content,
         SmartWebScraper]
 
+# Every tool's output is size-governed: oversized results are stored and replaced by a preview + handle
+output_governor = OutputGovernor(tool_outputs, handle_consumers=("ask_document", "summarize_content"))
+all_tools = [output_governor.wrap(t) for t in all_tools]
+
+
+# Heavy dependencies of each tool, loaded lazily on first call or by the warm-up thread
+TOOL_DEPENDENCIES = {
+    "SeeScreen": ["mss", "PIL.Image"],
+    "get_active_window_title": ["pygetwindow"],
+    "get_current_directory": ["pygetwindow"],
+    "Read": ["pypdf", "docx", "openpyxl"],
+    "Write": ["docx", "fpdf", "pandas", "openpyxl"],
+    "type_on_screen": ["pyautogui"],
+    "search_file_contents": ["pypdf", "docx", "openpyxl"],
+    "SmartWebScraper": ["requests", "bs4"],
+    "download_image_by_description": ["requests", "PIL.Image", get_tavily_client],
+    "ask_document": ["langchain.text_splitter", "langchain_chroma", get_embeddings],
+}
+
+# At most this many calls of the same tool run at once within one agent step
+TOOL_CONCURRENCY = {
+    "SeeScreen": 1,
+    "get_current_directory": 1,
+    "ask_document": 1,
+    "search_file_contents": 1,
+    "summarize_content": 2,
+    "Read": 4,
+    "SmartWebScraper": 4,
+}
+
+# Tools with side effects on the GUI, the clipboard or the file system run alone, in call order
+SERIAL_TOOLS = {
+    "type_on_screen", "open_file_or_app", "Save_to_clipboard", "get_clipboard_content",
+    "Create", "Delete", "Move", "Rename", "Write", "zip_files", "unzip_file",
+    "download_image_by_description", "execute_shell_command",
+}
+
+def warm_up_tools(on_done=None):
+    """Starts loading every tool's heavy dependencies in a background thread."""
+    return start_warm_up(TOOL_DEPENDENCIES, on_done=on_done)
+
 
 # Create agent 🤖
-agent = llm.bind_tools(all_tools)
+with timed("resource: bind_tools"):
+    agent = llm.bind_tools(all_tools)
@@ -0,0 +1,365 @@
+"""
+Offline micro-benchmarks for the assistant's hot paths.
+
+Usage:
+    python benchmarks.py excel [--rows 100000] [--cols 10]
+    python benchmarks.py screen [--width 2560] [--height 1440] [--frames 10]
+    python benchmarks.py gui-pump [--tokens 500] [--token-interval-ms 5]
+    python benchmarks.py replay [--scenario all] [--pages 500] [--files 200000] [--llm-latency-ms 0]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from tool_registry import lazy_import
+
+
+def measure(function, *args, **kwargs):
+    """
+    Returns (result, seconds, peak traced memory in MB). The function runs twice:
+    once for timing and once under tracemalloc, which would otherwise skew the timing.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak / (1024 * 1024)
+
+
+# --- Excel extraction ---
+
+def generate_workbook(path, rows, cols):
+    """Writes a synthetic workbook with mixed numbers and strings (write-only mode keeps this fast)."""
+    openpyxl = lazy_import("openpyxl")
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Data")
+    for r in range(rows):
+        sheet.append([r * cols + c if c % 2 else f"cell {r}-{c}" for c in range(cols)])
+    workbook.save(path)
+
+
+def legacy_excel_read(full_path):
+    """The original Read path: full read/write load and += per cell."""
+    workbook = lazy_import("openpyxl").load_workbook(full_path)
+    content = ""
+    for sheet_name in workbook.sheetnames:
+        sheet = workbook[sheet_name]
+        for row in sheet.iter_rows():
+            for cell in row:
+                if cell.value is not None:
+                    content += str(cell.value) + ' '
+            content += '\n'
+    return content
+
+
+def bench_excel(rows, cols):
+    from extractors import extract_text
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bench.xlsx")
+        start = time.perf_counter()
+        generate_workbook(path, rows, cols)
+        seconds = time.perf_counter() - start
+        print(f"Generated {rows} x {cols} workbook ({os.path.getsize(path) / 1e6:.1f} MB) in {seconds:.2f} s")
+
+        legacy, legacy_s, legacy_mb = measure(legacy_excel_read, path)
+        (streamed, _), stream_s, stream_mb = measure(extract_text, path)
+        (tsv, _), tsv_s, tsv_mb = measure(extract_text, path, output_format="tsv")
+        (first_rows, _), rows_s, rows_mb = measure(extract_text, path, rows=[(0, 1000)])
+
+        print(f"  {'path':<28}{'seconds':>10}{'peak MB':>10}")
+        print(f"  {'legacy (read/write, +=)':<28}{legacy_s:>10.2f}{legacy_mb:>10.1f}")
+        print(f"  {'read-only stream':<28}{stream_s:>10.2f}{stream_mb:>10.1f}")
+        print(f"  {'read-only stream, TSV':<28}{tsv_s:>10.2f}{tsv_mb:>10.1f}")
+        print(f"  {'read-only, first 1000 rows':<28}{rows_s:>10.2f}{rows_mb:>10.1f}")
+        print(f"  Output identical to legacy path: {legacy == streamed}")
+
+
+# --- Screenshot encoding ---
+
+def synthetic_frame(width, height, seed=0):
+    """A desktop-like BGRA buffer (flat panels plus lines of small text), as mss returns it."""
+    import random
+    Image = lazy_import("PIL.Image")
+    ImageDraw = lazy_import("PIL.ImageDraw")
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), (240, 240, 240))
+    draw = ImageDraw.Draw(image)
+    for _ in range(width * height // 12_000):
+        left, top = rng.randrange(width), rng.randrange(height)
+        draw.rectangle([left, top, left + rng.randrange(300), top + rng.randrange(200)],
+                       fill=tuple(rng.randrange(256) for _ in range(3)))
+    for top in range(0, height, 18):
+        line = "".join(rng.choice("abcdefghijklmnop qrstuvwxyz/\\:.0123456789") for _ in range(width // 6))
+        draw.text((8, top), line, fill=(20, 20, 20))
+    return bytearray(image.convert("RGBA").tobytes("raw", "BGRA"))
+
+
+def legacy_screen_encode(raw, size):
+    """The original SeeScreen path: bytes copy, RGB decode, in-place LANCZOS thumbnail, JPEG, base64, f-string."""
+    import base64
+    from io import BytesIO
+    Image = lazy_import("PIL.Image")
+    image = Image.frombytes("RGB", size, bytes(raw), "raw", "BGRX")
+    image.thumbnail((1920, 1080), Image.Resampling.LANCZOS)
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG", quality=90)
+    return f"data:image/jpeg;base64,{base64.b64encode(buffered.getvalue()).decode('utf-8')}"
+
+
+def bench_screen(width, height, frames):
+    import base64
+    from io import BytesIO
+    import screen_capture
+    Image = lazy_import("PIL.Image")
+
+    size = (width, height)
+    raws = [synthetic_frame(width, height, seed) for seed in range(min(frames, 3))]
+    print(f"{frames} synthetic {width} x {height} frames ({len(raws[0]) / 1e6:.1f} MB BGRA each)")
+
+    def per_frame(function):
+        """Average ms per frame of function(raw) over `frames` runs (after one warm-up run)."""
+        function(raws[0])
+        start = time.perf_counter()
+        for index in range(frames):
+            result = function(raws[index % len(raws)])
+        return result, (time.perf_counter() - start) * 1000 / frames
+
+    # Stage timings of the original path
+    rgb, legacy_decode = per_frame(lambda raw: Image.frombytes("RGB", size, bytes(raw), "raw", "BGRX"))
+    thumbnail_size = screen_capture.fit_within(rgb, (1920, 1080)).size
+    small, legacy_resize = per_frame(lambda raw: rgb.resize(thumbnail_size, Image.Resampling.LANCZOS))
+    jpeg, legacy_jpeg = per_frame(lambda raw: (lambda out: (small.save(out, format="JPEG", quality=90), out.getvalue())[1])(BytesIO()))
+    _, legacy_b64 = per_frame(lambda raw: f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode('utf-8')}")
+
+    # Stage timings of the current path
+    rgb, decode = per_frame(lambda raw: screen_capture.raw_to_image(raw, size))
+    small, resize = per_frame(lambda raw: screen_capture.fit_within(rgb, (1920, 1080)))
+    print(f"  {'stage (ms/frame)':<24}{'legacy':>10}{'current':>10}")
+    print(f"  {'decode BGRA -> RGB':<24}{legacy_decode:>10.1f}{decode:>10.1f}")
+    print(f"  {'downscale':<24}{legacy_resize:>10.1f}{resize:>10.1f}")
+    for image_format in ("jpeg", "webp", "png"):
+        buffer, encode = per_frame(lambda raw: screen_capture.encode_image(small, image_format, 90))
+        encoded_bytes = buffer.tell()
+        _, data_url = per_frame(lambda raw: screen_capture.to_data_url(buffer, image_format))
+        legacy = f"{legacy_jpeg:>10.1f}" if image_format == "jpeg" else f"{'':>10}"
+        print(f"  {'encode ' + image_format:<24}{legacy}{encode:>10.1f}   {encoded_bytes / 1000:.0f} KB")
+        legacy = f"{legacy_b64:>10.1f}" if image_format == "jpeg" else f"{'':>10}"
+        print(f"  {'data URL ' + image_format:<24}{legacy}{data_url:>10.1f}")
+
+    # End to end, with peak traced memory (Pillow's pixel buffers are not visible to tracemalloc,
+    # so this mostly counts the bytes copies, encoded payloads and base64 strings)
+    print(f"  {'end to end':<24}{'ms/frame':>10}{'peak MB':>10}{'KB sent':>10}")
+    _, legacy_ms = per_frame(lambda raw: legacy_screen_encode(raw, size))
+    url, _, legacy_mb = measure(legacy_screen_encode, raws[0], size)
+    print(f"  {'legacy':<24}{legacy_ms:>10.1f}{legacy_mb:>10.1f}{len(url) / 1000:>10.0f}")
+    for image_format in ("jpeg", "webp", "png"):
+        def current(raw):
+            return screen_capture.encode_for_vision(screen_capture.raw_to_image(raw, size), image_format=image_format)[0]
+        _, current_ms = per_frame(current)
+        url, _, current_mb = measure(current, raws[0])
+        print(f"  {'current ' + image_format:<24}{current_ms:>10.1f}{current_mb:>10.1f}{len(url) / 1000:>10.0f}")
+
+
+# --- GUI message pump ---
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def _pump_scenario(put, tokens, token_interval):
+    """Fake agent: a few separate messages with pauses, then a burst of streamed tokens. Returns put times."""
+    import random
+    rng = random.Random(0)
+    put_times = []
+    for index in range(10):
+        time.sleep(rng.uniform(0.05, 0.3))
+        put_times.append(time.perf_counter())
+        put(("AI", f"message {index}"))
+    for index in range(tokens):
+        time.sleep(token_interval)
+        put_times.append(time.perf_counter())
+        put(("AI", f" token{index}", "append"))
+    return put_times
+
+
+def bench_gui_pump(tokens, token_interval_ms, render_ms=2.0, idle_seconds=2.0):
+    """
+    Headless comparison of the old 100 ms polling pump and the event-driven MessageBridge.
+    A thread stands in for the Tk loop: it sleeps `render_ms` per render (per message for the
+    old pump, which rendered every item) and records when each message was rendered.
+    """
+    import queue
+    import threading
+    from gui_bridge import MessageBridge
+
+    token_interval = token_interval_ms / 1000
+    render_seconds = render_ms / 1000
+
+    def run(consumer, put):
+        rendered = []
+        stop = threading.Event()
+        loop = threading.Thread(target=consumer, args=(stop, rendered), daemon=True)
+        loop.start()
+        put_times = _pump_scenario(put, tokens, token_interval)
+        # Let the last items render, then count wake-ups while nothing is produced
+        time.sleep(0.3)
+        wakeups_before = loop_wakeups[0]
+        time.sleep(idle_seconds)
+        stop.set()
+        loop.join()
+        latencies = [(done - sent) * 1000 for sent, done in zip(put_times, rendered)]
+        return latencies, loop_wakeups[0] - wakeups_before
+
+    # Old pump: after(100) polling, one add_message per item
+    loop_wakeups = [0]
+    legacy_queue = queue.Queue()
+
+    def polling_consumer(stop, rendered):
+        while not stop.is_set():
+            loop_wakeups[0] += 1
+            while not legacy_queue.empty():
+                legacy_queue.get(0)
+                time.sleep(render_seconds)
+                rendered.append(time.perf_counter())
+            time.sleep(0.1)
+
+    legacy, legacy_idle_wakeups = run(polling_consumer, legacy_queue.put)
+    legacy_renders = tokens + 10
+
+    # Event-driven bridge: wake on first item, drain after the frame delay, one render per drain
+    loop_wakeups = [0]
+    bridge = MessageBridge()
+    wake_events = queue.Queue()
+    bridge.attach(lambda: wake_events.put(None))
+
+    def event_consumer(stop, rendered):
+        while not stop.is_set():
+            try:
+                wake_events.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            loop_wakeups[0] += 1
+            time.sleep(bridge.render_delay())
+            bridge.drain()
+            time.sleep(render_seconds)
+            rendered.extend([time.perf_counter()] * bridge.last_drained)
+
+    current, current_idle_wakeups = run(event_consumer, bridge.put)
+
+    print(f"10 messages + {tokens} streamed tokens every {token_interval_ms} ms, {render_ms} ms per render")
+    print(f"  {'pump':<18}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'renders':>9}{'idle wakeups/s':>16}")
+    print(f"  {'polling (100 ms)':<18}{_percentile(legacy, 0.5):>9.1f}{_percentile(legacy, 0.95):>9.1f}"
+          f"{max(legacy):>9.1f}{legacy_renders:>9}{legacy_idle_wakeups / idle_seconds:>16.1f}")
+    print(f"  {'event bridge':<18}{_percentile(current, 0.5):>9.1f}{_percentile(current, 0.95):>9.1f}"
+          f"{max(current):>9.1f}{bridge.renders:>9}{current_idle_wakeups / idle_seconds:>16.1f}")
+
+
+# --- Replayed agent sessions ---
+
+def bench_replay(scenario, pages, files, llm_latency_ms, token_ms, folder=None):
+    """Replays the scenarios and prints their timings. Returns the names of scenarios in which a tool call raised."""
+    from replay_harness import SCENARIOS, LocalWeb, replay
+    from tracing import summarize
+    # Imported up front only for its side effect, so the first session does not time the import
+    import agent_and_tools  # noqa: F401
+
+    options = {"pdf-summary": {"pages": pages}, "find-files": {"files": files}}
+    names = list(SCENARIOS) if scenario == "all" else [scenario]
+    failed = []
+    with tempfile.TemporaryDirectory() as scratch, LocalWeb() as web:
+        folder = folder or scratch
+        os.makedirs(folder, exist_ok=True)
+        for name in names:
+            start = time.perf_counter()
+            turns = SCENARIOS[name](folder, web, **options.get(name, {}))
+            print(f"\n{name}: {len(turns)} turns (fixtures ready in {time.perf_counter() - start:.1f} s)")
+
+            # Scripts are consumed by a replay, so both runs of `measure` rebuild them
+            def run():
+                return replay(SCENARIOS[name](folder, web, **options.get(name, {})), web,
+                              latency=llm_latency_ms / 1000, token_delay=token_ms / 1000)
+            result, seconds, peak_mb = measure(run)
+
+            turn_ms = [turn["seconds"] * 1000 for turn in result["turns"]]
+            first_token_ms = [turn["first_token_seconds"] * 1000 for turn in result["turns"]
+                              if turn["first_token_seconds"] is not None]
+            print(f"  session {seconds:.2f} s, peak traced memory {peak_mb:.1f} MB, "
+                  f"{result['agent_calls']} agent LLM calls, {result['tool_llm_calls']} LLM calls inside tools")
+            print(f"  turn latency ms: p50 {_percentile(turn_ms, 0.5):.1f}, p95 {_percentile(turn_ms, 0.95):.1f}, "
+                  f"max {max(turn_ms):.1f}; first token p50 {_percentile(first_token_ms, 0.5):.1f}")
+            for stats in result["summarizer"]:
+                print(f"  summarizer: {stats['mode']}, {stats['input_chars']} chars, {stats['chunks']} chunks, "
+                      f"{stats['levels']} reduce levels, {stats['llm_calls']} LLM calls")
+                # map_reduce is only chosen for documents too long for one call, so one chunk means the split failed
+                if stats["mode"] == "map_reduce" and stats["chunks"] == 1:
+                    print("  WARNING: a long document was summarized as a single chunk; the text splitter found no boundaries")
+            print(f"  {'turn':<6}{'ms':>10}{'first token':>13}  message")
+            for index, ((text, _), turn) in enumerate(zip(turns, result["turns"]), 1):
+                first = turn["first_token_seconds"]
+                first = f"{first * 1000:>13.1f}" if first is not None else f"{'-':>13}"
+                print(f"  {index:<6}{turn['seconds'] * 1000:>10.1f}{first}  {text[:60]}")
+            print(f"  {'tool':<28}{'calls':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+            for row in summarize(result["spans"]):
+                if row["kind"] == "tool":
+                    print(f"  {row['name'][:27]:<28}{row['count']:>7}{row['errors']:>8}{row['p50_ms']:>10.1f}"
+                          f"{row['p95_ms']:>10.1f}{row['max_ms']:>10.1f}")
+            # A tool that raised returns quickly, so its timings would otherwise pass for a fast success
+            errors = [span for span in result["spans"] if span["kind"] == "tool" and span.get("status") == "error"]
+            if errors:
+                failed.append(name)
+                print(f"  FAILED: {len(errors)} tool call(s) raised; the timings above do not measure the real work")
+                for span in errors:
+                    print(f"    {span['name']}: {span.get('error', '')}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks for Stepwise Assistant.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    excel = subparsers.add_parser("excel", help="Excel extraction: legacy Read path vs read-only streaming")
+    excel.add_argument("--rows", type=int, default=100_000)
+    excel.add_argument("--cols", type=int, default=10)
+
+    screen = subparsers.add_parser("screen", help="SeeScreen capture/encode stages on synthetic frames")
+    screen.add_argument("--width", type=int, default=2560)
+    screen.add_argument("--height", type=int, default=1440)
+    screen.add_argument("--frames", type=int, default=10)
+
+    pump = subparsers.add_parser("gui-pump", help="Headless latency of the GUI message pump (polling vs event-driven)")
+    pump.add_argument("--tokens", type=int, default=500)
+    pump.add_argument("--token-interval-ms", type=float, default=5.0)
+
+    replay = subparsers.add_parser("replay", help="Scripted agent sessions (fake LLM, local web): turn and tool latency")
+    replay.add_argument("--scenario", choices=["all", "pdf-summary", "find-files", "conversation"], default="all")
+    replay.add_argument("--pages", type=int, default=500, help="pages of the PDF to summarize")
+    replay.add_argument("--files", type=int, default=200_000, help="files in the tree to search")
+    replay.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated delay before each model answer")
+    replay.add_argument("--token-ms", type=float, default=0.0, help="simulated delay between streamed tokens")
+    replay.add_argument("--fixtures", help="folder to keep the generated files in between runs (default: a temp folder)")
+
+    args = parser.parse_args()
+    if args.benchmark == "excel":
+        bench_excel(args.rows, args.cols)
+    elif args.benchmark == "screen":
+        bench_screen(args.width, args.height, args.frames)
+    elif args.benchmark == "gui-pump":
+        bench_gui_pump(args.tokens, args.token_interval_ms)
+    elif args.benchmark == "replay":
+        failed = bench_replay(args.scenario, args.pages, args.files, args.llm_latency_ms, args.token_ms, args.fixtures)
+        if failed:
+            sys.exit(f"Tool calls failed in: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
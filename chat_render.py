@@ -0,0 +1,58 @@
+import re
+
+_BOLD = re.compile(r"\*\*(.*?)\*\*")  # matches **bold**
+
+NO_TAGS = ()
+BOLD_TAGS = ("bold",)
+BULLET_TAGS = ("bullet",)
+
+
+def parse_markdown(message):
+    """
+    Turns a chat message into [(text, tags)] spans for the chat window: "* " bullets become
+    "• " with the bullet indent and **bold** runs get the bold tag. Adjacent spans with the
+    same tags are merged, so even a long message needs only a few spans. Pure Python with no
+    Tk calls, so it can run on any thread.
+    """
+    spans = []
+
+    def add(text, tags):
+        if not text:
+            return
+        if spans and spans[-1][1] == tags:
+            spans[-1] = (spans[-1][0] + text, tags)
+        else:
+            spans.append((text, tags))
+
+    for line in message.splitlines():
+        # Match bullet points
+        if line.startswith("* "):
+            add("• ", BULLET_TAGS)
+            line = line[2:].strip()
+        index = 0
+        for match in _BOLD.finditer(line):
+            add(line[index:match.start()], NO_TAGS)
+            add(match.group(1), BOLD_TAGS)
+            index = match.end()
+        add(line[index:] + "\n", NO_TAGS)
+    return spans
+
+
+def insert_arguments(spans):
+    """Flattens spans into the `text, tags, text, tags, ...` arguments of a single Text.insert call."""
+    arguments = []
+    for text, tags in spans:
+        arguments.append(text)
+        arguments.append(tags)
+    return arguments
+
+
+def prepare_for_display(item):
+    """
+    MessageBridge hook run on the producing (agent) thread: complete messages are parsed
+    there, so the Tk thread only has to insert the ready-made spans.
+    """
+    if len(item) == 2 and not item[0].startswith("__"):
+        sender, message = item
+        return sender, message, "parsed", parse_markdown(message)
+    return item
@@ -1,12 +1,23 @@
 import threading
 import queue
-from AgentGUI import FloatingCircle
-from AgentGraph import run_agent_loop
 
 if __name__ == "__main__":
+    # App modules are imported here, not at module level: on Windows (spawn) every worker
+    # process of a process pool re-imports this file, and must not load the whole agent.
+    from gui_bridge import MessageBridge
+    from chat_render import prepare_for_display
+    from tool_registry import timed, startup_report
+
+    with timed("module: AgentGUI"):
+        from AgentGUI import FloatingCircle
+    with timed("module: AgentGraph"):
+        from AgentGraph import run_agent_loop
+    from agent_and_tools import warm_up_tools, screen_watcher
+    from screen_watcher import ENABLED_BY_DEFAULT as SCREEN_WATCHER_ENABLED
+
     # The queues allow safe communication between the GUI and the agent thread
     input_queue = queue.Queue()  # GUI -> Agent
-    output_queue = queue.Queue() # Agent -> GUI
+    output_queue = MessageBridge(prepare=prepare_for_display) # Agent -> GUI (wakes the Tk loop, no polling)
 
     # --- Start the agent thread ---
     # This runs the 'run_agent_loop' function in the background.
@@ -18,9 +29,15 @@ if __name__ == "__main__":
     )
     agent_thread.start()
 
+    # --- Warm up the tools ---
+    # Heavy tool dependencies (embedding model, pypdf, mss, ...) load in the background
+    # and the per-module / per-tool load times are printed once everything is ready.
+    warm_up_tools(on_done=lambda: print(startup_report()))
+
     # --- Start the GUI ---
     # This creates the floating circle and runs its main loop.
     # It must run in the main thread.
-    gui_app = FloatingCircle(input_queue, output_queue)
+    # With STEPWISE_SCREEN_WATCHER=1 the screen is described in the background while the chat is open.
+    gui_app = FloatingCircle(input_queue, output_queue,
+                             screen_watcher=screen_watcher if SCREEN_WATCHER_ENABLED else None)
     gui_app.mainloop()
-
@@ -0,0 +1,142 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from storage import data_path
+
+DEFAULT_INDEX_PATH = data_path("content_index.sqlite")
+# Only the first part of very large files is indexed
+MAX_INDEXED_CHARS = 2_000_000
+# Files (re-)indexed per search call; the rest is picked up by later calls
+MAX_FILES_PER_UPDATE = 500
+UPDATE_TIME_BUDGET = 20.0
+EXTRACT_THREADS = 4
+
+
+def _fts_query(text, operator):
+    """Turns free text into an FTS5 query of quoted terms joined by AND / OR (so user input is never parsed as syntax)."""
+    terms = re.findall(r"\w+", text, flags=re.UNICODE)
+    return f" {operator} ".join(f'"{term}"' for term in terms)
+
+
+class ContentIndex:
+    """
+    Persistent full-text (inverted) index over the content of local documents, stored
+    in SQLite FTS5 so it survives across sessions.
+
+    Files are indexed through the same extractors as `Read`, and re-indexed only when
+    their size or mtime changes; files that disappeared are removed. Searches are ranked
+    with BM25 and return a highlighted snippet per file.
+
+    Args:
+        extract: Function returning the text of a file path.
+        list_files: Function returning the indexable file paths under a directory.
+    """
+
+    def __init__(self, extract, list_files, path=DEFAULT_INDEX_PATH):
+        self.extract = extract
+        self.list_files = list_files
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, doc_id INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(path UNINDEXED, body, tokenize='unicode61 remove_diacritics 2')"
+        )
+        self._conn.commit()
+
+    def _indexed_under(self, root):
+        prefix = os.path.join(root, "")
+        rows = self._conn.execute(
+            "SELECT path, size, mtime_ns FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+        ).fetchall()
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def _remove(self, path):
+        row = self._conn.execute("SELECT doc_id FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            # The FTS row is deleted by rowid; a lookup by the unindexed path column would scan the table
+            self._conn.execute("DELETE FROM documents WHERE rowid = ?", (row[0],))
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _extract(self, path):
+        try:
+            return self.extract(path)[:MAX_INDEXED_CHARS]
+        except Exception:
+            # Unreadable or corrupt files are indexed as empty so they are not retried until they change
+            return ""
+
+    def update(self, root):
+        """
+        Brings the index for `root` up to date: indexes new and changed files (bounded by
+        MAX_FILES_PER_UPDATE and UPDATE_TIME_BUDGET) and drops deleted ones.
+
+        Returns:
+            (indexed, removed, pending) counts.
+        """
+        root = os.path.normpath(os.path.abspath(root))
+        current = {}
+        for path in self.list_files(root):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            current[path] = (stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            known = self._indexed_under(root)
+            removed = [path for path in known if path not in current]
+            for path in removed:
+                self._remove(path)
+            self._conn.commit()
+
+        changed = [path for path, version in current.items() if known.get(path) != version]
+        batch = changed[:MAX_FILES_PER_UPDATE]
+        deadline = time.monotonic() + UPDATE_TIME_BUDGET
+        indexed = 0
+        pool = ThreadPoolExecutor(max_workers=EXTRACT_THREADS, thread_name_prefix="content-index")
+        try:
+            for path, text in zip(batch, pool.map(self._extract, batch)):
+                size, mtime_ns = current[path]
+                with self._lock:
+                    self._remove(path)
+                    cursor = self._conn.execute("INSERT INTO documents (path, body) VALUES (?, ?)", (path, text))
+                    self._conn.execute("INSERT INTO files VALUES (?, ?, ?, ?)", (path, size, mtime_ns, cursor.lastrowid))
+                    self._conn.commit()
+                indexed += 1
+                if time.monotonic() > deadline:
+                    break
+        finally:
+            # Out of time: drop the extractions that have not started yet
+            pool.shutdown(wait=True, cancel_futures=True)
+        return indexed, len(removed), len(changed) - indexed
+
+    def search(self, query, root=None, limit=10):
+        """
+        Returns [(path, snippet, score)] for the files under `root` matching all query words
+        (or, if none match all of them, any word), best matches first.
+        """
+        prefix = os.path.join(os.path.normpath(os.path.abspath(root)), "") if root else ""
+        results = []
+        with self._lock:
+            for operator in ("AND", "OR"):
+                fts_query = _fts_query(query, operator)
+                if not fts_query:
+                    return []
+                results = self._conn.execute(
+                    "SELECT path, snippet(documents, 1, '**', '**', ' ... ', 16), bm25(documents) "
+                    "FROM documents WHERE documents MATCH ? AND substr(path, 1, ?) = ? "
+                    "ORDER BY bm25(documents) LIMIT ?",
+                    (fts_query, len(prefix), prefix, limit)
+                ).fetchall()
+                if results:
+                    break
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {"files": self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]}
@@ -0,0 +1,144 @@
+import json
+import os
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Estimated prompt tokens the history may use at the start of a turn
+HISTORY_TOKEN_BUDGET = int(os.environ.get("STEPWISE_HISTORY_TOKENS", 32_000))
+# The most recent turns (user message and everything after it) are always kept verbatim
+KEEP_RECENT_TURNS = 2
+# Older tool outputs are cut to this many characters
+OLD_TOOL_OUTPUT_CHARS = 600
+# Older final answers are cut to this many characters once their turn is collapsed
+OLD_ANSWER_CHARS = 1500
+# Gemini bills an image in a message as a fixed number of tokens
+IMAGE_TOKENS = 258
+CHARS_PER_TOKEN = 4
+
+
+def _content_chars(content):
+    if isinstance(content, str):
+        return len(content), 0
+    chars = images = 0
+    for part in content:
+        if isinstance(part, dict) and part.get("type") == "image_url":
+            images += 1
+        elif isinstance(part, dict):
+            chars += len(part.get("text", ""))
+        else:
+            chars += len(str(part))
+    return chars, images
+
+
+def estimate_tokens(message):
+    """Cheap local token estimate (about 4 characters per token) for one message."""
+    chars, images = _content_chars(message.content)
+    for call in getattr(message, "tool_calls", None) or ():
+        chars += len(call["name"]) + len(json.dumps(call["args"], default=str))
+    # A few tokens of per-message framing (role, separators)
+    return 4 + chars // CHARS_PER_TOKEN + images * IMAGE_TOKENS
+
+
+def _shorten(text, limit, what):
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}\n[... {len(text) - limit} more characters of {what} omitted from history ...]"
+
+
+class HistoryManager:
+    """
+    Keeps the conversation history sent to Gemini within a token budget.
+
+    Compaction only touches turns older than the last `keep_recent_turns`, and goes step
+    by step until the history fits: first old tool outputs (file contents, scraped pages,
+    shell output) are cut short; then whole old turns are collapsed to the user's message
+    and the final answer, dropping their tool calls; finally the oldest turns are dropped.
+    The system message always stays.
+    """
+
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET, keep_recent_turns=KEEP_RECENT_TURNS):
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.last_stats = {}
+
+    @staticmethod
+    def _split_turns(messages):
+        """Returns (leading system messages, [turn]) where each turn starts at a HumanMessage."""
+        head = []
+        index = 0
+        while index < len(messages) and isinstance(messages[index], SystemMessage):
+            head.append(messages[index])
+            index += 1
+        turns = []
+        for message in messages[index:]:
+            if isinstance(message, HumanMessage) or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+        return head, turns
+
+    def compact(self, messages):
+        """Returns the history to carry into the next turn (the input list is not modified)."""
+        messages = list(messages)
+        tokens_before = total = sum(estimate_tokens(message) for message in messages)
+        stats = {"tokens_before": tokens_before, "truncated_tool_outputs": 0, "collapsed_turns": 0, "dropped_turns": 0}
+        if total <= self.token_budget:
+            self.last_stats = dict(stats, tokens_after=total)
+            return messages
+
+        head, turns = self._split_turns(messages)
+        old_count = max(0, len(turns) - self.keep_recent_turns)
+        turn_tokens = [sum(estimate_tokens(message) for message in turn) for turn in turns]
+
+        # 1. Cut long tool outputs in old turns, oldest first
+        for index in range(old_count):
+            if total <= self.token_budget:
+                break
+            compacted = []
+            for message in turns[index]:
+                if isinstance(message, ToolMessage) and isinstance(message.content, str) \
+                        and len(message.content) > OLD_TOOL_OUTPUT_CHARS:
+                    message = message.model_copy(
+                        update={"content": _shorten(message.content, OLD_TOOL_OUTPUT_CHARS, "tool output")})
+                    stats["truncated_tool_outputs"] += 1
+                compacted.append(message)
+            turns[index] = compacted
+            total += self._retally(turns, turn_tokens, index)
+
+        # 2. Collapse old turns to the user's message and the final answer
+        for index in range(old_count):
+            if total <= self.token_budget:
+                break
+            turns[index] = self._collapse(turns[index])
+            stats["collapsed_turns"] += 1
+            total += self._retally(turns, turn_tokens, index)
+
+        # 3. Drop the oldest turns
+        dropped = 0
+        while dropped < old_count and total > self.token_budget:
+            total -= turn_tokens[dropped]
+            dropped += 1
+        stats["dropped_turns"] = dropped
+
+        compacted = head + [message for turn in turns[dropped:] for message in turn]
+        self.last_stats = dict(stats, tokens_after=total)
+        return compacted
+
+    @staticmethod
+    def _retally(turns, turn_tokens, index):
+        """Recounts one turn's tokens and returns the change."""
+        tokens = sum(estimate_tokens(message) for message in turns[index])
+        change = tokens - turn_tokens[index]
+        turn_tokens[index] = tokens
+        return change
+
+    @staticmethod
+    def _collapse(turn):
+        """The turn's user message plus its last AI answer without tool calls (shortened)."""
+        collapsed = [turn[0]]
+        answers = [message for message in turn[1:] if isinstance(message, AIMessage) and not message.tool_calls]
+        if answers:
+            content = answers[-1].content
+            if isinstance(content, list):
+                content = "\n".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+            collapsed.append(AIMessage(content=_shorten(content, OLD_ANSWER_CHARS, "the answer")))
+        return collapsed
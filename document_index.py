@@ -0,0 +1,93 @@
+import hashlib
+import threading
+import uuid
+from tool_registry import lazy_import
+from embedding_cache import CachedEmbeddings
+from embedding_engine import stream_chunks
+
+# Documents larger than this (in characters) are split and embedded as a stream
+STREAM_THRESHOLD = 100_000
+
+
+class DocumentIndex:
+    """
+    Session-scoped vector index used by `ask_document`.
+
+    Each document is split and embedded only the first time it is seen; afterwards
+    questions about it only run retrieval. Documents are identified by the hash of
+    their content, so re-reading the same file (or clipboard text) maps to the same entry.
+    The whole index is dropped with `reset()` when the chat session ends.
+    """
+
+    def __init__(self, embeddings_getter, chunk_size=1000, chunk_overlap=100):
+        self.embeddings_getter = embeddings_getter
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._vectorstore = None
+        self._documents = {}  # doc_id -> number of chunks
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def document_id(content):
+        return hashlib.sha256(content.encode("utf-8", errors="ignore")).hexdigest()
+
+    def _store(self):
+        if self._vectorstore is None:
+            Chroma = lazy_import("langchain_chroma").Chroma
+            self._vectorstore = Chroma(
+                collection_name=f"session_{uuid.uuid4().hex}",
+                embedding_function=self.embeddings_getter()
+            )
+        return self._vectorstore
+
+    def __contains__(self, doc_id):
+        return doc_id in self._documents
+
+    def add(self, content, doc_id=None):
+        """Indexes the content unless it is already in the session index and returns its document id."""
+        doc_id = doc_id or self.document_id(content)
+        with self._lock:
+            if doc_id in self._documents:
+                return doc_id
+            # Extracted text (PDF pages especially) often has no blank lines, so fall back to line,
+            # then word boundaries; otherwise a whole section would come back as one chunk
+            RecursiveCharacterTextSplitter = lazy_import("langchain.text_splitter").RecursiveCharacterTextSplitter
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap,
+                                                           separators=["\n\n", "\n", " ", ""])
+            embeddings = self.embeddings_getter()
+            if len(content) > STREAM_THRESHOLD and isinstance(embeddings, CachedEmbeddings):
+                # Large document: embed chunks while the rest is still being split. The vectors
+                # land in the embedding cache, so adding the chunks to Chroma below is only lookups.
+                chunks = []
+
+                def produce():
+                    for chunk in stream_chunks(text_splitter, content):
+                        chunks.append(chunk)
+                        yield chunk
+
+                embeddings.embed_stream(produce())
+            else:
+                chunks = text_splitter.split_text(content)
+            if chunks:
+                self._store().add_texts(
+                    chunks,
+                    metadatas=[{"doc_id": doc_id} for _ in chunks],
+                    ids=[f"{doc_id}:{i}" for i in range(len(chunks))]
+                )
+            self._documents[doc_id] = len(chunks)
+        return doc_id
+
+    def as_retriever(self, doc_id, k=3):
+        """Returns a retriever restricted to the chunks of a single document."""
+        return self._store().as_retriever(
+            search_kwargs={"k": k, "filter": {"doc_id": doc_id}},
+            search_type="similarity_score_threshold"
+        )
+
+    def reset(self):
+        """Drops every indexed document (called when the chat session is reset)."""
+        with self._lock:
+            if self._vectorstore is not None:
+                self._vectorstore.delete_collection()
+            self._vectorstore = None
+            self._documents.clear()
@@ -0,0 +1,200 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from langchain_core.embeddings import Embeddings
+from storage import data_path
+
+DEFAULT_CACHE_PATH = data_path("embedding_cache.sqlite")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB of vectors
+
+
+def content_key(model_name, text):
+    """Content-addressed key: the same chunk text embedded by the same model always maps to the same entry."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk (SQLite) store of embedding vectors keyed by chunk-content hash,
+    with size-bounded least-recently-used eviction and hit/miss counters.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0), COALESCE(MAX(last_used), 0) FROM embeddings").fetchone()
+        self._total_bytes, self._clock = row
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def get_many(self, keys):
+        """Returns {key: vector} for the keys present in the cache and marks them as recently used."""
+        found = {}
+        if not keys:
+            return found
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # SQLite limits the number of bound parameters, so look keys up in slices
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                stamp = self._tick()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", [(stamp, key) for key in found])
+                self._conn.commit()
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        """Stores (key, vector) pairs and evicts the least recently used entries if over budget."""
+        if not items:
+            return
+        with self._lock:
+            stamp = self._tick()
+            rows = []
+            for key, vector in items:
+                blob = array("f", vector).tobytes()
+                rows.append((key, blob, len(blob), stamp))
+            for key, _, size, _ in rows:
+                previous = self._conn.execute("SELECT size FROM embeddings WHERE key = ?", (key,)).fetchone()
+                self._total_bytes += size - (previous[0] if previous else 0)
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        # Drop down to 90% of the budget so eviction doesn't run on every insert
+        target = int(self.max_bytes * 0.9)
+        cursor = self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_used ASC")
+        doomed = []
+        for key, size in cursor:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def stats(self):
+        """Returns the cache counters and current size."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._total_bytes = 0
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps any LangChain `Embeddings` so that only chunks never seen before are embedded.
+    Repeated and overlapping documents reuse the vectors stored in the `EmbeddingCache`.
+    """
+
+    def __init__(self, embeddings, model_name, cache=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache or EmbeddingCache()
+
+    def embed_documents(self, texts):
+        keys = [content_key(self.model_name, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Embed each missing chunk once, even if it appears several times in the input
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(list(fresh.items()))
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def embed_stream(self, texts):
+        """
+        Embeds an iterable of chunks as it is produced, sending only uncached chunks
+        to the wrapped model (through its own `embed_stream` when it has one).
+        """
+        keys = []
+        cached = {}
+
+        def misses():
+            pending = set()
+            for text in texts:
+                key = content_key(self.model_name, text)
+                keys.append(key)
+                if key in cached or key in pending:
+                    continue
+                found = self.cache.get_many([key])
+                if found:
+                    cached.update(found)
+                else:
+                    pending.add(key)
+                    yield key, text
+
+        missing_keys = []
+
+        def texts_to_embed():
+            for key, text in misses():
+                missing_keys.append(key)
+                yield text
+
+        if hasattr(self.embeddings, "embed_stream"):
+            vectors = self.embeddings.embed_stream(texts_to_embed())
+        else:
+            texts_list = list(texts_to_embed())
+            vectors = self.embeddings.embed_documents(texts_list) if texts_list else []
+
+        fresh = list(zip(missing_keys, vectors))
+        self.cache.put_many(fresh)
+        cached.update(fresh)
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        key = content_key(f"{self.model_name}:query", text)
+        cached = self.cache.get_many([key])
+        if key in cached:
+            return cached[key]
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many([(key, vector)])
+        return vector
+
+    def stats(self):
+        return self.cache.stats()
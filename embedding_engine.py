@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from langchain_core.embeddings import Embeddings
+import embedding_worker
+
+# Defaults can be tuned per machine without touching code (useful on CPU-only boxes)
+DEFAULT_BATCH_SIZE = int(os.environ.get("STEPWISE_EMBED_BATCH_SIZE", 64))
+DEFAULT_THREADS = int(os.environ.get("STEPWISE_EMBED_THREADS", min(4, os.cpu_count() or 1)))
+DEFAULT_PROCESSES = int(os.environ.get("STEPWISE_EMBED_PROCESSES", 0))
+
+
+def stream_chunks(splitter, content, section_size=50_000, separators=("\n\n", "\n", " ")):
+    """
+    Yields the chunks of `content` section by section, so embedding can start
+    while the rest of a very large document is still being split.
+
+    Sections end on the last boundary before `section_size` characters, trying the
+    separators in order (paragraph, line, word) and cutting mid-word only when none
+    occurs, and are split independently with the given LangChain text splitter.
+    """
+    start = 0
+    length = len(content)
+    while start < length:
+        end = min(start + section_size, length)
+        if end < length:
+            for separator in separators:
+                boundary = content.rfind(separator, start, end)
+                if boundary > start:
+                    end = boundary + len(separator)
+                    break
+        for chunk in splitter.split_text(content[start:end]):
+            yield chunk
+        start = end
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    Batched, parallel front-end for an `Embeddings` model.
+
+    Chunks are embedded in batches of `batch_size` on a pool of `num_threads` threads,
+    or on `num_processes` worker processes when a picklable `model_factory` is given
+    (each process loads its own model once, when it starts; `warm_up()` starts them ahead
+    of the first batch). Throughput of the last run and of the whole
+    session is kept in `last_run` / `totals` and formatted by `report()`.
+    """
+
+    def __init__(self, embeddings, batch_size=DEFAULT_BATCH_SIZE, num_threads=DEFAULT_THREADS,
+                 num_processes=DEFAULT_PROCESSES, model_factory=None):
+        self.embeddings = embeddings
+        self.batch_size = max(1, batch_size)
+        self.num_threads = max(1, num_threads)
+        self.num_processes = num_processes if model_factory else 0
+        self.model_factory = model_factory
+        self.last_run = None
+        self.totals = {"chunks": 0, "batches": 0, "seconds": 0.0}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                if self.num_processes > 0:
+                    # The worker functions live in embedding_worker, which spawned workers can import cheaply
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.num_processes,
+                        initializer=embedding_worker.load_model,
+                        initargs=(self.model_factory,)
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.num_threads, thread_name_prefix="embed")
+            return self._executor
+
+    def _submit(self, batch):
+        if self.num_processes > 0:
+            return self._pool().submit(embedding_worker.embed_batch, batch)
+        return self._pool().submit(self.embeddings.embed_documents, batch)
+
+    def warm_up(self):
+        """
+        Starts the worker processes in the background, so their models are loaded before
+        the first large document arrives. Does nothing in thread mode.
+        """
+        if self.num_processes > 0:
+            pool = self._pool()
+            for _ in range(self.num_processes):
+                pool.submit(embedding_worker.ready)
+
+    def embed_stream(self, chunks):
+        """
+        Embeds an iterable of chunks, submitting each batch as soon as it is full,
+        and returns the vectors in input order.
+        """
+        start = time.perf_counter()
+        futures = []
+        batch = []
+        count = 0
+        for chunk in chunks:
+            batch.append(chunk)
+            count += 1
+            if len(batch) >= self.batch_size:
+                futures.append(self._submit(batch))
+                batch = []
+        if batch:
+            futures.append(self._submit(batch))
+
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+
+        self._record(count, len(futures), time.perf_counter() - start)
+        return vectors
+
+    def embed_documents(self, texts):
+        # Small inputs are not worth the pool round-trip
+        if len(texts) <= self.batch_size:
+            start = time.perf_counter()
+            vectors = self.embeddings.embed_documents(texts)
+            self._record(len(texts), 1, time.perf_counter() - start)
+            return vectors
+        return self.embed_stream(texts)
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    def _record(self, chunks, batches, seconds):
+        self.last_run = {
+            "chunks": chunks,
+            "batches": batches,
+            "seconds": seconds,
+            "chunks_per_second": chunks / seconds if seconds > 0 else 0.0,
+        }
+        with self._lock:
+            self.totals["chunks"] += chunks
+            self.totals["batches"] += batches
+            self.totals["seconds"] += seconds
+
+    def report(self):
+        """Formats the throughput of the last run and of the whole session."""
+        mode = f"{self.num_processes} processes" if self.num_processes > 0 else f"{self.num_threads} threads"
+        lines = [f"Embedding engine: batch size {self.batch_size}, {mode}"]
+        if self.last_run:
+            run = self.last_run
+            lines.append(
+                f"  last run: {run['chunks']} chunks in {run['batches']} batches, "
+                f"{run['seconds']:.2f} s ({run['chunks_per_second']:.1f} chunks/s)"
+            )
+        totals = self.totals
+        rate = totals["chunks"] / totals["seconds"] if totals["seconds"] > 0 else 0.0
+        lines.append(f"  session: {totals['chunks']} chunks, {totals['seconds']:.2f} s ({rate:.1f} chunks/s)")
+        return "\n".join(lines)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
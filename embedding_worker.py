@@ -0,0 +1,27 @@
+"""
+Worker-process side of EmbeddingEngine's process mode.
+
+Kept apart from embedding_engine.py and has no heavy imports at module level: with the
+spawn start method (Windows) every worker imports the module of the function it runs, so
+only the model the factory builds is loaded in the worker.
+"""
+import os
+
+# The model of this worker, built once by the pool initializer and reused by every batch
+_embeddings = None
+
+
+def load_model(factory):
+    """Pool initializer: builds this worker's model."""
+    global _embeddings
+    _embeddings = factory()
+
+
+def embed_batch(texts):
+    """Embeds one batch with the worker's model (runs in a separate process)."""
+    return _embeddings.embed_documents(texts)
+
+
+def ready():
+    """No-op task: submitting one per worker starts the workers and loads their models ahead of the first batch."""
+    return os.getpid()
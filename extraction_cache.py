@@ -0,0 +1,167 @@
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from storage import data_path
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # ~256 MB of extracted text in memory
+DEFAULT_DISK_PATH = data_path("extraction_cache.sqlite")
+DEFAULT_DISK_MAX_BYTES = 1024 * 1024 * 1024
+# Set STEPWISE_PERSIST_EXTRACTIONS=1 to keep extraction results across sessions
+PERSIST_BY_DEFAULT = os.environ.get("STEPWISE_PERSIST_EXTRACTIONS", "0") == "1"
+
+
+def _freeze(value):
+    """Turns option values (lists of pages, sheet names, ...) into hashable, repr-stable keys."""
+    if isinstance(value, (list, tuple, set)):
+        return tuple(value)
+    return value
+
+
+class ExtractionCache:
+    """
+    Bounded cache of `Read` extraction results keyed on
+    (absolute path, size, mtime_ns, requested range/options).
+
+    A changed file gets a new size/mtime and therefore never hits an old entry; old
+    versions of a path are dropped as soon as a new one is stored. Entries are evicted
+    least-recently-used once the cached text exceeds `max_bytes`. With `persist=True`
+    results are also written to a SQLite file and reused by later sessions.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, persist=PERSIST_BY_DEFAULT,
+                 disk_path=DEFAULT_DISK_PATH, disk_max_bytes=DEFAULT_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._versions = {}  # path -> set of keys for that path
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(disk_path, disk_max_bytes) if persist else None
+
+    @staticmethod
+    def make_key(full_path, **options):
+        full_path = os.path.abspath(full_path)
+        stat = os.stat(full_path)
+        frozen = tuple(sorted((name, _freeze(value)) for name, value in options.items()))
+        return full_path, stat.st_size, stat.st_mtime_ns, frozen
+
+    def get_or_extract(self, full_path, extractor, **options):
+        """Returns the cached result for the file/options, or runs `extractor(full_path, **options)` and caches it."""
+        key = self.make_key(full_path, **options)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        value = self._disk.get(key) if self._disk else None
+        if value is None:
+            value = extractor(full_path, **options)
+            if self._disk:
+                self._disk.put(key, value)
+            with self._lock:
+                self.misses += 1
+        else:
+            with self._lock:
+                self.hits += 1
+        self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        size = len(value[0]) if isinstance(value, tuple) else len(value)
+        path = key[0]
+        with self._lock:
+            # Drop entries for older versions of the same file
+            for old_key in list(self._versions.get(path, ())):
+                if old_key[1:3] != key[1:3]:
+                    self._remove(old_key)
+            if key in self._entries or size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._versions.setdefault(path, set()).add(key)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+        versions = self._versions.get(key[0])
+        if versions is not None:
+            versions.discard(key)
+            if not versions:
+                del self._versions[key[0]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "persistent": self._disk is not None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._total_bytes = 0
+
+
+class _DiskTier:
+    """SQLite store of pickled extraction results with LRU eviction by total bytes."""
+
+    def __init__(self, path, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            "key TEXT PRIMARY KEY, path TEXT NOT NULL, file_size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "value BLOB NOT NULL, size INTEGER NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+        self._clock = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM extractions").fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM extractions WHERE key = ?", (repr(key),)).fetchone()
+            if row is None:
+                return None
+            self._clock += 1
+            self._conn.execute("UPDATE extractions SET last_used = ? WHERE key = ?", (self._clock, repr(key)))
+            self._conn.commit()
+            return pickle.loads(row[0])
+
+    def put(self, key, value):
+        blob = pickle.dumps(value)
+        with self._lock:
+            self._clock += 1
+            # Older versions of the same file can never be hit again
+            path, file_size, mtime_ns, _ = key
+            self._conn.execute(
+                "DELETE FROM extractions WHERE path = ? AND (file_size != ? OR mtime_ns != ?)",
+                (path, file_size, mtime_ns)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (repr(key), path, file_size, mtime_ns, blob, len(blob), self._clock)
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM extractions").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._conn.execute("SELECT key, size FROM extractions ORDER BY last_used ASC").fetchall()
+                doomed = []
+                for old_key, size in rows:
+                    if total <= self.max_bytes * 0.9:
+                        break
+                    doomed.append((old_key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM extractions WHERE key = ?", doomed)
+            self._conn.commit()
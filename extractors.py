@@ -0,0 +1,227 @@
+import bisect
+import csv
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from tool_registry import lazy_import
+
+# PDFs with at least this many pages to extract are split across worker processes
+PARALLEL_PDF_MIN_PAGES = 16
+PDF_PAGES_PER_TASK = 8
+# Excel rows are yielded in blocks of this many, so a character budget stops a huge sheet early
+EXCEL_ROWS_PER_BLOCK = 1000
+# Where new processes are spawned rather than forked (Windows, macOS) each worker starts a fresh
+# interpreter, which costs more than a medium PDF takes to extract, so the serial path is the
+# default there; STEPWISE_PDF_WORKERS sets the number of worker processes explicitly.
+_SPAWNS_WORKERS = multiprocessing.get_all_start_methods()[0] != "fork"
+PDF_WORKERS = int(os.environ.get("STEPWISE_PDF_WORKERS",
+                                 1 if _SPAWNS_WORKERS else max(1, min(8, (os.cpu_count() or 2) - 1))))
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.xlsx', '.xlsm', '.txt')
+
+_pdf_pool = None
+
+
+def _get_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is None:
+        _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _pdf_pool
+
+
+def parse_ranges(spec):
+    """
+    Parses a 1-based range string such as "1-5,8,10-12" into sorted, merged 0-based
+    (start, stop) pairs with `stop` exclusive: [(0, 5), (7, 8), (9, 12)]. The ranges are
+    never expanded here, so "1-100000000" costs nothing until it is clamped to the
+    document's length. Returns None for an empty spec (meaning "everything").
+    """
+    if spec is None or not str(spec).strip():
+        return None
+    ranges = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            start, stop = max(0, int(first) - 1), int(last)
+        else:
+            start = max(0, int(part) - 1)
+            stop = int(part)
+        if stop > start:
+            ranges.append((start, stop))
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def range_indices(ranges, count):
+    """The 0-based indices below `count` covered by `ranges` (from `parse_ranges`; None means all), in order."""
+    if ranges is None:
+        return range(count)
+    return [i for start, stop in ranges for i in range(start, min(stop, count))]
+
+
+def in_ranges(index, ranges):
+    """Whether the 0-based index is covered by `ranges` (None means all)."""
+    if ranges is None:
+        return True
+    position = bisect.bisect_right(ranges, (index, float("inf"))) - 1
+    return position >= 0 and ranges[position][0] <= index < ranges[position][1]
+
+
+def iter_pdf_pages(full_path, pages=None):
+    """
+    Yields the text of each requested PDF page, in order.
+    Large page sets are extracted in parallel on a process pool, with a bounded
+    number of tasks in flight so a consumer that stops early never parses the whole file.
+    """
+    pypdf = lazy_import("pypdf")
+    with open(full_path, 'rb') as f:
+        reader = pypdf.PdfReader(f)
+        page_indices = range_indices(pages, len(reader.pages))
+
+        if len(page_indices) < PARALLEL_PDF_MIN_PAGES or PDF_WORKERS < 2:
+            for i in page_indices:
+                yield reader.pages[i].extract_text() or ''
+            return
+
+    # The worker function lives in pdf_worker, which spawned workers can import cheaply
+    extract_pdf_pages = lazy_import("pdf_worker").extract_pdf_pages
+    tasks = [page_indices[i:i + PDF_PAGES_PER_TASK] for i in range(0, len(page_indices), PDF_PAGES_PER_TASK)]
+    pool = _get_pdf_pool()
+    in_flight = []
+    next_task = 0
+    try:
+        while next_task < len(tasks) or in_flight:
+            while next_task < len(tasks) and len(in_flight) < PDF_WORKERS * 2:
+                in_flight.append(pool.submit(extract_pdf_pages, full_path, tasks[next_task]))
+                next_task += 1
+            for text in in_flight.pop(0).result():
+                yield text
+    finally:
+        # The consumer stopped early (e.g. character budget reached): drop the remaining work
+        for future in in_flight:
+            future.cancel()
+
+
+def iter_docx_paragraphs(full_path, paragraphs=None):
+    """Yields each requested paragraph of a Word document, newline-terminated."""
+    doc = lazy_import("docx").Document(full_path)
+    for i, para in enumerate(doc.paragraphs):
+        if in_ranges(i, paragraphs):
+            yield para.text + '\n'
+
+
+def _excel_row_writer(output_format):
+    """Returns a function formatting one row of cell values as a line of text."""
+    if output_format in ('csv', 'tsv'):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=',' if output_format == 'csv' else '\t', lineterminator='\n')
+
+        def write(values):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(['' if value is None else value for value in values])
+            return buffer.getvalue()
+        return write
+
+    # Default format: non-empty values separated by spaces, one line per row
+    return lambda values: ''.join(str(value) + ' ' for value in values if value is not None) + '\n'
+
+
+def iter_excel_sheets(full_path, sheets=None, rows=None, output_format='text'):
+    """
+    Yields the text of the requested sheets in blocks of EXCEL_ROWS_PER_BLOCK rows, streaming
+    the workbook in read-only, values-only mode so memory stays flat even for very large
+    files, and a consumer that stops early never reads the rest of a sheet.
+
+    Args:
+        full_path: Path of the workbook.
+        sheets: Sheet names to extract, or None for all.
+        rows: 0-based (start, stop) row ranges from `parse_ranges` (applied to every sheet), or None for all.
+        output_format: 'text' (space separated values), 'tsv' or 'csv'.
+    """
+    workbook = lazy_import("openpyxl").load_workbook(full_path, read_only=True, data_only=True)
+    try:
+        write_row = _excel_row_writer(output_format)
+        # Only the span from the first to the last requested row is read
+        min_row = rows[0][0] + 1 if rows else None
+        max_row = rows[-1][1] if rows else None
+        for sheet_name in workbook.sheetnames:
+            if sheets and sheet_name not in sheets:
+                continue
+            sheet = workbook[sheet_name]
+            lines = []
+            for row_number, values in enumerate(sheet.iter_rows(min_row=min_row, max_row=max_row, values_only=True),
+                                                start=(min_row or 1) - 1):
+                if in_ranges(row_number, rows):
+                    lines.append(write_row(values))
+                    if len(lines) >= EXCEL_ROWS_PER_BLOCK:
+                        yield ''.join(lines)
+                        lines = []
+            if lines:
+                yield ''.join(lines)
+    finally:
+        workbook.close()
+
+
+def iter_text_file(full_path, block_size=1024 * 1024):
+    """Yields a plain text file in blocks."""
+    with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def iter_extract(full_path, pages=None, sheets=None, rows=None, output_format='text'):
+    """
+    Streams the text of a supported file in page / paragraph / sheet / block units.
+
+    Args:
+        full_path: Path of the file.
+        pages: 0-based (start, stop) page (PDF) or paragraph (DOCX) ranges from `parse_ranges`, or None for all.
+        sheets: Sheet names to extract from Excel workbooks, or None for all.
+        rows: 0-based (start, stop) row ranges to extract from each Excel sheet, or None for all.
+        output_format: Excel output format: 'text', 'tsv' or 'csv'.
+    """
+    extension = os.path.splitext(full_path)[1].lower()
+    if extension == '.pdf':
+        return iter_pdf_pages(full_path, pages)
+    if extension == '.docx':
+        return iter_docx_paragraphs(full_path, pages)
+    if extension in ['.xlsx', '.xlsm']:
+        return iter_excel_sheets(full_path, sheets, rows, output_format)
+    if extension == '.txt':
+        return iter_text_file(full_path)
+    raise ValueError(f"Unsupported file type: {extension}")
+
+
+def extract_text(full_path, pages=None, sheets=None, max_chars=None, rows=None, output_format='text'):
+    """
+    Extracts the text of a file, stopping as soon as `max_chars` characters are collected.
+
+    Returns:
+        (text, truncated) where `truncated` tells whether the budget cut the content short.
+    """
+    parts = []
+    total = 0
+    units = iter_extract(full_path, pages, sheets, rows, output_format)
+    try:
+        for unit in units:
+            if max_chars is not None and total + len(unit) > max_chars:
+                parts.append(unit[:max_chars - total])
+                return ''.join(parts), True
+            parts.append(unit)
+            total += len(unit)
+    finally:
+        units.close()
+    return ''.join(parts), False
@@ -0,0 +1,321 @@
+import fnmatch
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Directories checked less than this many seconds ago are trusted without another stat.
+# 0 stats every directory on every query (one os.stat each), so changes show up at once.
+DEFAULT_REFRESH_INTERVAL = 0.0
+# Directory listings run on a thread pool once a tree level has at least this many directories
+PARALLEL_MIN_DIRS = 4
+WALKER_THREADS = 8
+
+# Folders that list_directory_tree shows but does not descend into by default
+DEFAULT_IGNORE = (".git", "node_modules", "__pycache__", ".venv", "venv", ".mypy_cache", ".pytest_cache")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _walker_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=WALKER_THREADS, thread_name_prefix="file-index")
+        return _pool
+
+
+def _ignore_matcher(patterns):
+    """Returns a predicate telling whether a directory name matches one of the ignore globs."""
+    if not patterns:
+        return lambda name: False
+    regex = re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+    return lambda name: regex.match(name) is not None
+
+
+def _folders_match(matchers, folders):
+    """
+    True if the list of folder names is matched by the component matchers, where None
+    stands for a "**" component (any number of folders).
+    """
+    if not matchers:
+        return not folders
+    first, rest = matchers[0], matchers[1:]
+    if first is None:
+        return any(_folders_match(rest, folders[index:]) for index in range(len(folders) + 1))
+    return bool(folders) and first(folders[0]) is not None and _folders_match(rest, folders[1:])
+
+
+class DirRecord:
+    """One indexed directory: its mtime when scanned and its entries in scandir order."""
+    __slots__ = ("mtime_ns", "entries", "names", "dirs", "checked_at")
+
+    def __init__(self, mtime_ns, entries, checked_at):
+        self.mtime_ns = mtime_ns
+        self.entries = entries  # list of (name, is_dir)
+        # Flat name lists let queries filter with C-level loops
+        self.names = [name for name, _ in entries]
+        self.dirs = [name for name, is_dir in entries if is_dir]
+        self.checked_at = checked_at
+
+    def subdirs(self):
+        return self.dirs
+
+
+class FileIndex:
+    """
+    In-memory index of the local file system behind `find_files` and `list_directory_tree`.
+
+    Directories are crawled once with `os.scandir` (only as deep as a query needs) and then
+    refreshed incrementally: a directory's mtime changes whenever an entry is added, removed
+    or renamed in it, so only directories whose mtime moved are re-listed. With a positive
+    `refresh_interval`, directories checked that recently are answered straight from memory.
+    Tools that change files call `invalidate` on the folders they touched, which also covers
+    file systems with coarse mtimes (FAT/exFAT: 2 s).
+    """
+
+    def __init__(self, refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._dirs = {}  # normalized dir path -> DirRecord
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normpath(os.path.abspath(path))
+
+    @staticmethod
+    def _probe(path, known_mtime_ns=None):
+        """
+        Lists one directory with os.scandir (DirEntry type info avoids a stat per entry).
+        Returns (mtime_ns, entries), or (mtime_ns, None) when the mtime still equals `known_mtime_ns`.
+        Runs on the walker threads, so it must not touch the index itself.
+        """
+        entries = []
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            if known_mtime_ns is not None and mtime_ns == known_mtime_ns:
+                return mtime_ns, None
+            with os.scandir(path) as iterator:
+                for entry in iterator:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    entries.append((entry.name, is_dir))
+        except OSError:
+            mtime_ns = None
+        return mtime_ns, entries
+
+    def invalidate(self, *paths):
+        """Marks these directories as changed, so the next query lists them again whatever their mtime."""
+        with self._lock:
+            for path in paths:
+                record = self._dirs.get(self._key(path))
+                if record is not None:
+                    record.mtime_ns = None
+                    record.checked_at = float("-inf")
+
+    def _store(self, path, record):
+        old = self._dirs.get(path)
+        self._dirs[path] = record
+        if old is not None:
+            # Forget subdirectories that no longer exist (and everything below them)
+            removed = set(old.subdirs()) - set(record.subdirs())
+            for name in removed:
+                self._forget(os.path.join(path, name))
+
+    def _forget(self, path):
+        record = self._dirs.pop(path, None)
+        if record is not None:
+            for name in record.subdirs():
+                self._forget(os.path.join(path, name))
+
+    def ensure(self, path, max_depth=None, ignore=None, deadline=None):
+        """
+        Makes sure `path` and its subdirectories (down to `max_depth`, or all of them) are indexed
+        and up to date. The tree is processed level by level and each level's directories are
+        listed in parallel on a thread pool.
+
+        Args:
+            ignore: Directory name glob patterns that are listed but never descended into.
+            deadline: Optional time.monotonic() value after which the crawl stops early.
+
+        Returns:
+            (root key, complete) where `complete` is False if the deadline cut the crawl short.
+        """
+        root = self._key(path)
+        ignored = _ignore_matcher(ignore)
+        level = [root]
+        depth = 0
+        while level:
+            if deadline is not None and time.monotonic() > deadline:
+                return root, False
+            now = time.monotonic()
+
+            # Decide which directories need a listing (new) or an mtime check (stale)
+            with self._lock:
+                probes = []
+                for current in level:
+                    record = self._dirs.get(current)
+                    if record is None:
+                        probes.append((current, None))
+                    elif now - record.checked_at >= self.refresh_interval:
+                        probes.append((current, record.mtime_ns))
+
+            if len(probes) < PARALLEL_MIN_DIRS:
+                results = [self._probe(current, known) for current, known in probes]
+            else:
+                results = list(_walker_pool().map(lambda probe: self._probe(*probe), probes))
+
+            with self._lock:
+                for (current, known), (mtime_ns, entries) in zip(probes, results):
+                    if entries is None:
+                        record = self._dirs.get(current)
+                        if record is not None:
+                            record.checked_at = now
+                    else:
+                        self._store(current, DirRecord(mtime_ns, entries, now))
+
+                next_level = []
+                if max_depth is None or depth < max_depth:
+                    for current in level:
+                        record = self._dirs.get(current)
+                        if record is None:
+                            continue
+                        for name in record.dirs:
+                            if not ignored(name):
+                                next_level.append(os.path.join(current, name))
+            level = next_level
+            depth += 1
+        return root, True
+
+    def walk(self, path, max_depth=None):
+        """Returns [(dir_path, depth, entries)] for the indexed subtree, parents before children."""
+        root, _ = self.ensure(path, max_depth)
+        snapshot = []
+        with self._lock:
+            stack = [(root, 0)]
+            while stack:
+                current, depth = stack.pop()
+                record = self._dirs.get(current)
+                if record is None:
+                    continue
+                # Records are replaced, never mutated, on rescan, so the entries list can be shared
+                snapshot.append((current, depth, record.entries))
+                if max_depth is None or depth < max_depth:
+                    for name in reversed(record.subdirs()):
+                        stack.append((os.path.join(current, name), depth + 1))
+        return snapshot
+
+    def render_tree(self, path, depth=0, max_entries=500, max_per_dir=100, ignore=DEFAULT_IGNORE, time_budget=5.0):
+        """
+        Formats the tree under `path` as indented "- name" lines, bounded in size and time:
+        at most `max_per_dir` entries per folder (the rest is summarized), at most `max_entries`
+        lines overall, ignored folders are shown but not expanded, and crawling stops after
+        `time_budget` seconds.
+        """
+        deadline = time.monotonic() + time_budget if time_budget else None
+        root, complete = self.ensure(path, depth, ignore, deadline)
+        ignored = _ignore_matcher(ignore)
+        lines = []
+        state = {"truncated": False}
+
+        def render(current, level):
+            indent = "  " * level
+            record = self._dirs.get(current)
+            if record is None:
+                lines.append(f"{indent}(not listed)")
+                return
+            shown = record.entries[:max_per_dir]
+            for name, is_dir in shown:
+                if len(lines) >= max_entries:
+                    state["truncated"] = True
+                    return
+                skipped = is_dir and ignored(name)
+                lines.append(f"{indent}- {name}" + (" (not expanded)" if skipped else ""))
+                if is_dir and not skipped and level < depth:
+                    render(os.path.join(current, name), level + 1)
+                    if state["truncated"]:
+                        return
+            remaining = record.entries[max_per_dir:]
+            if remaining:
+                folders = sum(1 for _, is_dir in remaining if is_dir)
+                lines.append(f"{indent}... {len(remaining)} more entries ({folders} folders, {len(remaining) - folders} files)")
+
+        with self._lock:
+            render(root, 0)
+        if state["truncated"]:
+            lines.append(f"[Output truncated at {max_entries} entries. Use a smaller depth or a more specific path.]")
+        if not complete:
+            lines.append(f"[Listing stopped after {time_budget} seconds; some folders were not scanned.]")
+        return "\n".join(lines)
+
+    def find(self, start_dir, pattern=None, contains=None, extension=None, limit=None):
+        """
+        Returns the paths under `start_dir` matching every given criterion:
+        a glob `pattern` on the name, a case-insensitive `contains` substring of the name,
+        and/or a file `extension`. A pattern with separators ("src/*.py") matches at any
+        depth, like glob's "**/src/*.py": its last component is matched against the name and
+        the others, one folder each ("**" for any number), against the folders just above it.
+        Like glob, hidden entries are skipped unless the pattern (or one of its components)
+        starts with a dot.
+        """
+        flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+        include_hidden = bool(pattern and pattern.startswith("."))
+        folder_matchers = None
+        if pattern and ("/" in pattern or os.sep in pattern):
+            components = [part for part in re.split(r"[/\\]" if os.sep == "\\" else "/", pattern) if part not in ("", ".")]
+            if not components or components[-1] == "**":
+                # "src/**" names everything below src
+                components = components[:-1] + ["**", "*"]
+            pattern = components[-1]
+            include_hidden = any(part.startswith(".") for part in components)
+            # A leading "**" makes the folder components match at any depth
+            folder_matchers = [None] + [None if part == "**" else re.compile(fnmatch.translate(part), flags).match
+                                        for part in components[:-1]]
+
+        # Every criterion becomes a compiled regex so names can be filtered without Python-level loops
+        name_filters = []
+        if pattern:
+            name_filters.append(re.compile(fnmatch.translate(pattern), flags).match)
+        if contains:
+            name_filters.append(re.compile(re.escape(contains), re.IGNORECASE).search)
+        if extension:
+            suffix = extension if extension.startswith(".") else "." + extension
+            name_filters.append(re.compile(re.escape(suffix) + r"\Z", re.IGNORECASE).search)
+
+        root, _ = self.ensure(start_dir)
+        results = []
+        with self._lock:
+            stack = [(root, "")]
+            while stack:
+                current, relative_dir = stack.pop()
+                record = self._dirs.get(current)
+                if record is None:
+                    continue
+                # Folders are matched once per directory, not once per name
+                if folder_matchers is not None and not _folders_match(folder_matchers, relative_dir.split("/")[:-1]):
+                    matched = ()
+                else:
+                    matched = record.names
+                for name_filter in name_filters:
+                    matched = filter(name_filter, matched)
+                for name in matched:
+                    if not include_hidden and name[0] == ".":
+                        continue
+                    results.append(os.path.join(current, name))
+                    if limit and len(results) >= limit:
+                        return results
+                for name in record.dirs:
+                    if include_hidden or name[0] != ".":
+                        stack.append((os.path.join(current, name), relative_dir + name + "/"))
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directories": len(self._dirs),
+                "entries": sum(len(record.entries) for record in self._dirs.values()),
+            }
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import deque
+
+# Streamed text is rendered at most once per frame
+FRAME_SECONDS = 1 / 60
+
+
+def coalesce(items):
+    """
+    Merges consecutive streamed deltas (sender, text, "append") of the same sender into one
+    item, so a burst of tokens costs a single insert into the chat window.
+    """
+    merged = []
+    for item in items:
+        if (len(item) == 3 and item[2] == "append" and merged
+                and len(merged[-1]) == 3 and merged[-1][2] == "append" and merged[-1][0] == item[0]):
+            merged[-1] = (item[0], merged[-1][1] + item[1], "append")
+        else:
+            merged.append(item)
+    return merged
+
+
+class MessageBridge:
+    """
+    Channel from the agent thread to the GUI loop that replaces polling `output_queue`
+    every 100 ms. Producers `put` items exactly as they did on the queue; the first item
+    after a drain calls the consumer's thread-safe `wake` function (for Tk, posting a
+    virtual event), later items only accumulate until the consumer drains them. The
+    consumer waits `render_delay()` before draining so bursts of tokens coalesce into one
+    render per frame, and nothing runs while the agent is idle.
+
+    Args:
+        prepare: Optional function applied to every item on the producer's thread before it
+                 is queued (e.g. parsing markdown, so the GUI thread does less work).
+    """
+
+    def __init__(self, frame_seconds=FRAME_SECONDS, prepare=None):
+        self.frame_seconds = frame_seconds
+        self.prepare = prepare
+        self.wakeups = 0
+        self.renders = 0
+        self.last_drained = 0
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._wake = None
+        self._wake_pending = False
+        self._last_render = float("-inf")
+
+    def attach(self, wake):
+        """Registers the consumer's wake function and wakes it if items are already waiting."""
+        with self._lock:
+            self._wake = wake
+            self._wake_pending = False
+        if self._items:
+            self._signal()
+
+    def put(self, item):
+        if self.prepare is not None:
+            item = self.prepare(item)
+        with self._lock:
+            self._items.append(item)
+            if self._wake is None or self._wake_pending:
+                return
+            self._wake_pending = True
+        self._signal()
+
+    def _signal(self):
+        with self._lock:
+            self._wake_pending = True
+        self.wakeups += 1
+        try:
+            self._wake()
+        except Exception:
+            # The GUI loop is not running (yet, or any more); the next put or attach retries
+            with self._lock:
+                self._wake_pending = False
+
+    def render_delay(self):
+        """Seconds the consumer should wait before draining, to keep to one render per frame."""
+        return max(0.0, self._last_render + self.frame_seconds - time.perf_counter())
+
+    def drain(self):
+        """Takes every waiting item (streamed deltas coalesced) and re-arms the wake-up."""
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+            self._wake_pending = False
+        self.last_drained = len(items)
+        self._last_render = time.perf_counter()
+        if items:
+            self.renders += 1
+        return coalesce(items)
+
+    def empty(self):
+        return not self._items
+
+    def stats(self):
+        return {"wakeups": self.wakeups, "renders": self.renders, "waiting": len(self._items)}
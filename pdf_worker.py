@@ -0,0 +1,24 @@
+"""
+Worker-process side of parallel PDF extraction.
+
+Kept apart from extractors.py and imports nothing but pypdf: with the spawn start method
+(Windows) every worker imports the module of the function it runs, so this must stay
+cheap to import.
+"""
+import os
+import pypdf
+
+# The last file opened by this worker: later tasks of the same file skip re-parsing it
+_open_reader = (None, None)
+
+
+def extract_pdf_pages(full_path, page_indices):
+    """Extracts the text of the given pages (runs in a separate process)."""
+    global _open_reader
+    stat = os.stat(full_path)
+    key = (full_path, stat.st_size, stat.st_mtime_ns)
+    if _open_reader[0] != key:
+        # Given a path, pypdf reads the file into memory, so no handle stays open
+        _open_reader = (key, pypdf.PdfReader(full_path))
+    reader = _open_reader[1]
+    return [reader.pages[i].extract_text() or '' for i in page_indices]
@@ -0,0 +1,388 @@
+"""
+Deterministic replays of agent sessions for offline benchmarks (python benchmarks.py replay).
+
+The real graph and agent loop (`AgentGraph.run_agent_loop`) run unchanged. Only the model is
+swapped for a `ScriptedChatModel` that replays recorded tool calls, Tavily is swapped for a
+local stand-in, and web pages are served from a local HTTP server. No API key or network
+access is needed, so turn latency, tool latency and memory can be compared between commits.
+"""
+import http.server
+import json
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import StructuredTool
+from conversation_history import estimate_tokens
+
+# agent_and_tools builds its Gemini and Tavily clients on import; replays never call them
+os.environ.setdefault("GOOGLE_API_KEY", "replay")
+os.environ.setdefault("TAVILY_API_KEY", "replay")
+
+_HANDLE = re.compile(r"blob:[0-9a-f]{12}")
+_script_lock = threading.Lock()
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that replays a script instead of calling an API. Every call takes the next
+    step: a string (the answer), a list of (tool name, args) tool calls, or a function of
+    the messages that returns either (for arguments only known at run time, such as blob
+    handles). Once the script is used up it answers `default`. Streams word by word like
+    Gemini and reports token usage estimated from the messages.
+
+    `latency` is the delay before the first token and `token_delay` the delay between
+    tokens, in seconds (both 0 by default, so only the assistant's own overhead is timed).
+    """
+
+    steps: list = []
+    default: str = "Done."
+    latency: float = 0.0
+    token_delay: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def _next_message(self, messages):
+        # The summarizer calls the model from several threads at once
+        with _script_lock:
+            self.calls += 1
+            call = self.calls
+            step = self.steps.pop(0) if self.steps else self.default
+        if callable(step):
+            step = step(messages)
+        if isinstance(step, str):
+            message = AIMessage(content=step)
+        else:
+            message = AIMessage(content="", tool_calls=[
+                {"name": name, "args": args, "id": f"call_{call}_{index}"} for index, (name, args) in enumerate(step)])
+        input_tokens = sum(estimate_tokens(each) for each in messages)
+        output_tokens = estimate_tokens(message)
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                  "total_tokens": input_tokens + output_tokens}
+        return message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next_message(messages)
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next_message(messages)
+        time.sleep(self.latency)
+        for token in re.findall(r"\S+\s*", message.content):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            tool_call_chunks=[{"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                              for index, call in enumerate(message.tool_calls)],
+            usage_metadata=message.usage_metadata,
+        ))
+
+
+def pass_handle(tool_name, argument="content", **extra):
+    """
+    Script step calling `tool_name` with the handle of the last stored tool output (or the
+    last tool output itself if it was small enough to be shown in full).
+    """
+    def step(messages):
+        output = next((message.content for message in reversed(messages) if isinstance(message, ToolMessage)), "")
+        handle = _HANDLE.search(output)
+        return [(tool_name, {argument: handle.group(0) if handle else output, **extra})]
+    return step
+
+
+# --- Local stand-ins for the web ---
+
+def article_html(number, paragraphs=40):
+    """A synthetic article page (headings, paragraphs, code) for SmartWebScraper."""
+    sentences = " ".join(f"Sentence {i} of article {number} discusses measurement, caching and latency budgets."
+                         for i in range(8))
+    body = "".join(f"<h2>Section {i}</h2><p>{sentences}</p>" + ("<code>result = cache.get(key)</code>" if i % 5 == 0 else "")
+                   for i in range(paragraphs))
+    return (f"<html><head><title>Article {number}</title><script>var tracking = 1;</script></head>"
+            f"<body><nav>Home | About</nav><h1>Article {number}</h1>{body}<footer>Footer</footer></body></html>")
+
+
+class LocalWeb:
+    """
+    Serves synthetic articles at http://127.0.0.1:<port>/article/<n> while in use. Proxy
+    environment variables are cleared for the duration, as SmartWebScraper honours them.
+    """
+
+    def __init__(self):
+        self._server = None
+        self._saved_environment = {}
+
+    def __enter__(self):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(handler):
+                match = re.fullmatch(r"/article/(\d+)", handler.path)
+                if match is None:
+                    handler.send_error(404)
+                    return
+                page = article_html(int(match.group(1))).encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", "text/html; charset=utf-8")
+                handler.send_header("Content-Length", str(len(page)))
+                handler.end_headers()
+                handler.wfile.write(page)
+
+            def log_message(handler, *args):
+                pass
+
+        for name in list(os.environ):
+            if name.lower() in ("http_proxy", "https_proxy", "all_proxy"):
+                self._saved_environment[name] = os.environ.pop(name)
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        os.environ.update(self._saved_environment)
+
+    def url(self, number):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/article/{number}"
+
+
+def search_stand_in(name, description, web):
+    """A tool with Tavily's name and description that returns canned results pointing at `web`."""
+    def search(query: str) -> str:
+        results = [{"url": web.url(number), "content": f"Result {number} for '{query}': an article about {query}."}
+                   for number in range(1, 6)]
+        return json.dumps(results)
+    return StructuredTool.from_function(func=search, name=name, description=description)
+
+
+# --- Driving the agent loop ---
+
+class Collector:
+    """Stands in for the GUI's MessageBridge and timestamps what the agent sends."""
+
+    def __init__(self):
+        self.items = queue.Queue()
+
+    def put(self, item):
+        self.items.put((time.perf_counter(), item))
+
+
+class ReplaySession:
+    """
+    Runs `AgentGraph.run_agent_loop` on a thread, exactly as the GUI does, with the scripted
+    model in place of Gemini (the agent and the LLM used inside tools, without a response
+    cache so every run does the same work), Tavily replaced by the stand-in, fresh file and
+    extraction caches, and traces written to a scratch file.
+    """
+
+    def __init__(self, agent_model, tool_model, web):
+        self.agent_model = agent_model
+        self.tool_model = tool_model
+        self.web = web
+        self.trace_path = None
+        self.spans = []
+        self.summarizer_stats = []
+        self._patches = []
+
+    def _patch(self, target, name, value):
+        self._patches.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    def __enter__(self):
+        import AgentGraph
+        import agent_and_tools
+        import tracing
+        from extraction_cache import ExtractionCache
+        from file_index import FileIndex
+
+        search = agent_and_tools.search_tool
+        stand_in = agent_and_tools.output_governor.wrap(search_stand_in(search.name, search.description, self.web))
+        self._patch(AgentGraph, "agent", self.agent_model)
+        self._patch(AgentGraph, "all_tools", [stand_in if tool.name == search.name else tool
+                                              for tool in agent_and_tools.all_tools])
+        self._patch(agent_and_tools, "tool_llm", self.tool_model)
+        self._patch(agent_and_tools.summarizer, "llm", self.tool_model)
+        summarize = agent_and_tools.summarizer.summarize
+
+        def recording_summarize(*args, **kwargs):
+            summary, stats = summarize(*args, **kwargs)
+            self.summarizer_stats.append(stats)
+            return summary, stats
+        self._patch(agent_and_tools.summarizer, "summarize", recording_summarize)
+        self._patch(agent_and_tools, "file_index", FileIndex())
+        self._patch(agent_and_tools, "extraction_cache", ExtractionCache())
+        handle, self.trace_path = tempfile.mkstemp(suffix=".jsonl", prefix="replay-trace-")
+        os.close(handle)
+        self._patch(tracing, "TRACE_FILE", self.trace_path)
+        self._patch(AgentGraph, "TRACING_ENABLED", True)
+        agent_and_tools.reset_session()
+
+        self.input_queue = queue.Queue()
+        self.output = Collector()
+        self._thread = threading.Thread(target=AgentGraph.run_agent_loop, args=(self.input_queue, self.output), daemon=True)
+        self._thread.start()
+        return self
+
+    def send(self, text, timeout=600):
+        """Sends one user message and waits for the final answer. Returns the turn's timings."""
+        start = time.perf_counter()
+        self.input_queue.put(text)
+        first_token = None
+        while True:
+            at, item = self.output.items.get(timeout=timeout)
+            sender, message, *mode = item
+            if sender != "AI":
+                continue
+            if mode == ["append"] and first_token is None:
+                first_token = at - start
+            elif not mode:
+                return {"seconds": at - start, "first_token_seconds": first_token, "answer": message}
+
+    def __exit__(self, *exc_info):
+        from tracing import load_spans
+        self.input_queue.put("__EXIT__")
+        # A turn's spans are written once the graph run ends, just after the answer was sent
+        self._thread.join(timeout=30)
+        self.spans = load_spans(self.trace_path)
+        for target, name, value in reversed(self._patches):
+            setattr(target, name, value)
+        os.remove(self.trace_path)
+
+
+def replay(turns, web, latency=0.0, token_delay=0.0):
+    """
+    Replays `turns` ([(user message, [script steps])]) in one session. Returns a dict with
+    per-turn timings, the recorded trace spans, the number of model calls and the
+    stats of every summarizer call, in the order they finished.
+    """
+    agent_model = ScriptedChatModel(steps=[step for _, steps in turns for step in steps],
+                                    latency=latency, token_delay=token_delay)
+    tool_model = ScriptedChatModel(default="A concise summary of the section: caching, latency and budgets.",
+                                   latency=latency, token_delay=token_delay)
+    with ReplaySession(agent_model, tool_model, web) as session:
+        results = [session.send(text) for text, _ in turns]
+    return {"turns": results, "spans": session.spans, "agent_calls": agent_model.calls,
+            "tool_llm_calls": tool_model.calls, "summarizer": session.summarizer_stats}
+
+
+# --- Scenarios: each returns [(user message, [script steps])], creating its files in `folder` ---
+
+ANSWER = ("Here is what I found. **Summary**: the material covers caching, latency budgets and measurement.\n"
+          "* The first point explains where the time goes.\n* The second point lists the fixes.\n"
+          "Let me know if you need more detail on any of these.")
+
+
+def write_pdf(path, pages):
+    """A text PDF with `pages` pages of about 2,000 characters each."""
+    FPDF = __import__("fpdf").FPDF
+    pdf = FPDF()
+    pdf.set_font("Arial", size=10)
+    text = " ".join(f"Paragraph {i} reports quarterly figures, risks and the outlook for the business unit."
+                    for i in range(24))
+    for page in range(pages):
+        pdf.add_page()
+        pdf.multi_cell(0, 5, f"Page {page + 1}\n{text}")
+    pdf.output(path)
+
+
+def pdf_summary_scenario(folder, web, pages=500):
+    """Read a long PDF and summarize it (the Read output is passed to summarize_content by handle)."""
+    name = f"report_{pages}.pdf"
+    if not os.path.exists(os.path.join(folder, name)):
+        write_pdf(os.path.join(folder, name), pages)
+    return [
+        (f"Summarize {name} in {folder}", [
+            [("Read", {"path": folder, "file_name": name})],
+            pass_handle("summarize_content"),
+            ANSWER,
+        ]),
+    ]
+
+
+def make_file_tree(root, files):
+    """`files` empty files spread over 20 x 50 folders; every 1000th is an invoice, every 100th a .csv."""
+    if os.path.exists(os.path.join(root, "done")):
+        return
+    per_folder = max(1, files // 1000)
+    number = 0
+    for top in range(20):
+        for sub in range(50):
+            folder = os.path.join(root, f"area_{top:02d}", f"project_{sub:02d}")
+            os.makedirs(folder, exist_ok=True)
+            for _ in range(per_folder):
+                if number % 1000 == 0:
+                    name = f"invoice_{number}.pdf"
+                elif number % 100 == 0:
+                    name = f"table_{number}.csv"
+                else:
+                    name = f"notes_{number}.txt"
+                open(os.path.join(folder, name), "w").close()
+                number += 1
+    open(os.path.join(root, "done"), "w").close()
+
+
+def find_files_scenario(folder, web, files=200_000):
+    """Search a large file tree three times: cold index, warm index, then a tree listing."""
+    root = os.path.join(folder, f"tree_{files}")
+    make_file_tree(root, files)
+    return [
+        (f"Find all invoices in {root}", [
+            [("find_files", {"start_dir": root, "contains": "invoice"})],
+            ANSWER,
+        ]),
+        ("Now find the CSV files there", [
+            [("find_files", {"start_dir": root, "extension": ".csv"})],
+            ANSWER,
+        ]),
+        ("Show me the folder structure", [
+            [("list_directory_tree", {"path": root, "depth": 1})],
+            ANSWER,
+        ]),
+    ]
+
+
+def conversation_scenario(folder, web):
+    """A 10-turn conversation mixing chat, web search and scraping, files and system tools."""
+    notes = os.path.join(folder, "notes")
+    os.makedirs(notes, exist_ok=True)
+    for number in range(5):
+        with open(os.path.join(notes, f"meeting_{number}.txt"), "w", encoding="utf-8") as notes_file:
+            notes_file.write(f"Meeting {number}\n" + "Action item: measure before optimizing.\n" * 200)
+    search = "tavily_search_results_json"
+    return [
+        ("Hi! Can you help me with some research today?", [ANSWER]),
+        ("What time is it?", [[("Current_time", {})], "It is late afternoon."]),
+        ("Search the web for articles on latency budgets", [[(search, {"query": "latency budgets"})], ANSWER]),
+        ("Open the first result and summarize it", [
+            [("SmartWebScraper", {"link": web.url(1)})],
+            pass_handle("summarize_content"),
+            ANSWER,
+        ]),
+        (f"What is in {notes}?", [[("list_directory_tree", {"path": notes})], ANSWER]),
+        ("Read meeting_0.txt", [[("Read", {"path": notes, "file_name": "meeting_0.txt"})], ANSWER]),
+        ("Find all the .txt files there", [[("find_files", {"start_dir": notes, "extension": ".txt"})], ANSWER]),
+        ("Search for caching articles and compare the top two", [
+            [(search, {"query": "caching"})],
+            [("SmartWebScraper", {"link": web.url(2)}), ("SmartWebScraper", {"link": web.url(3)})],
+            ANSWER,
+        ]),
+        ("Which computer am I on, and who am I?", [[("get_username", {}), ("GetSystemInfo", {})], ANSWER]),
+        ("Thanks, that's all for now.", ["You're welcome! Have a great day."]),
+    ]
+
+
+SCENARIOS = {
+    "pdf-summary": pdf_summary_scenario,
+    "find-files": find_files_scenario,
+    "conversation": conversation_scenario,
+}
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from langchain_core.caches import BaseCache
+from storage import data_path
+
+# Set STEPWISE_LLM_CACHE=0 to send every tool LLM call to the API
+CACHE_ENABLED = os.environ.get("STEPWISE_LLM_CACHE", "1") == "1"
+# Cached responses older than this many seconds are not reused (0 keeps them until evicted)
+DEFAULT_TTL = float(os.environ.get("STEPWISE_LLM_CACHE_TTL", 24 * 3600))
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # ~64 MB of responses in memory
+DEFAULT_DISK_PATH = data_path("llm_response_cache.sqlite")
+DEFAULT_DISK_MAX_BYTES = 256 * 1024 * 1024
+# Set STEPWISE_PERSIST_LLM_CACHE=1 to keep responses across sessions
+PERSIST_BY_DEFAULT = os.environ.get("STEPWISE_PERSIST_LLM_CACHE", "0") == "1"
+
+# Message fields that vary between identical requests (ids, metadata of earlier responses)
+_VOLATILE_FIELDS = {"id", "response_metadata", "usage_metadata"}
+
+
+def _strip_volatile(value):
+    if isinstance(value, dict):
+        return {key: _strip_volatile(item) for key, item in value.items() if key not in _VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_strip_volatile(item) for item in value]
+    return value
+
+
+def request_key(prompt, llm_string):
+    """
+    Key of one LLM request: a hash of the model and its parameters (`llm_string`, which
+    LangChain builds from the model name, temperature, ...) and the normalized messages.
+    """
+    try:
+        prompt = json.dumps(_strip_volatile(json.loads(prompt)), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        pass  # plain string prompts (completion models) are used as they are
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class ResponseCache(BaseCache):
+    """
+    LangChain LLM cache for the tools' own LLM calls (summaries, ask_document answers,
+    screen descriptions), which run at temperature 0 and so give the same answer for the
+    same request. Set as the `cache` of a chat model, it answers repeated requests without
+    an API call.
+
+    Entries live in an in-memory LRU tier bounded by `max_bytes` and, with `persist=True`,
+    in a SQLite tier that later sessions reuse. Entries older than `ttl` seconds are
+    treated as missing.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, persist=PERSIST_BY_DEFAULT,
+                 disk_path=DEFAULT_DISK_PATH, disk_max_bytes=DEFAULT_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (generations, size, created)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(disk_path, disk_max_bytes) if persist else None
+
+    def _expired(self, created):
+        return bool(self.ttl) and time.time() - created > self.ttl
+
+    def lookup(self, prompt, llm_string):
+        key = request_key(prompt, llm_string)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[2]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self._remove(key)
+
+        found = self._disk.get(key) if self._disk else None
+        if found is not None and not self._expired(found[1]):
+            generations = pickle.loads(found[0])
+            self._store(key, generations, len(found[0]), found[1])
+            with self._lock:
+                self.hits += 1
+            return generations
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def update(self, prompt, llm_string, return_val):
+        key = request_key(prompt, llm_string)
+        serialized = pickle.dumps(return_val)
+        created = time.time()
+        self._store(key, return_val, len(serialized), created)
+        if self._disk:
+            self._disk.put(key, serialized, created)
+
+    def _store(self, key, generations, size, created):
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            self._remove(key)
+            self._entries[key] = (generations, size, created)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+        if self._disk:
+            self._disk.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "persistent": self._disk is not None,
+            }
+
+
+class _DiskTier:
+    """SQLite store of pickled responses with LRU eviction by total bytes."""
+
+    def __init__(self, path, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+        self._clock = self._conn.execute("SELECT COALESCE(MAX(last_used), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """Returns (pickled value, created) or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._clock += 1
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (self._clock, key))
+            self._conn.commit()
+            return row
+
+    def put(self, key, value, created):
+        with self._lock:
+            self._clock += 1
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                               (key, value, len(value), created, self._clock))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC").fetchall()
+                doomed = []
+                for old_key, size in rows:
+                    if total <= self.max_bytes * 0.9:
+                        break
+                    doomed.append((old_key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
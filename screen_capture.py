@@ -0,0 +1,322 @@
+import base64
+import math
+import os
+import threading
+import time
+from io import BytesIO
+from tool_registry import lazy_import
+
+# Frames are compared on a small grayscale thumbnail (each cell averages a ~15x15 pixel block).
+# A cell counts as changed when it moved by more than PIXEL_TOLERANCE gray levels, and a frame
+# counts as unchanged when at most MAX_CHANGED_CELLS cells changed (tolerates a blinking caret).
+SIGNATURE_SIZE = (128, 72)
+PIXEL_TOLERANCE = int(os.environ.get("STEPWISE_SCREEN_PIXEL_TOLERANCE", 6))
+MAX_CHANGED_CELLS = int(os.environ.get("STEPWISE_SCREEN_MAX_CHANGED_CELLS", 2))
+# Cached descriptions older than this many seconds are never reused
+CACHE_MAX_AGE = float(os.environ.get("STEPWISE_SCREEN_CACHE_MAX_AGE", 120))
+# Screenshots sent to the vision model are encoded to stay close to this many bytes
+TARGET_PAYLOAD_BYTES = int(os.environ.get("STEPWISE_SCREEN_TARGET_BYTES", 250_000))
+# Image format sent to the vision model: "jpeg", "webp" or "png" (palette). JPEG is by far the
+# fastest; WEBP and palette PNG take ~15x / ~5x longer per frame (see `benchmarks.py screen`)
+IMAGE_FORMAT = os.environ.get("STEPWISE_SCREEN_FORMAT", "jpeg").lower()
+IMAGE_MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+# Size of the reduced copy encoded to estimate how large a full frame will be
+PROBE_PIXELS = 640 * 360
+# JPEG/WEBP size at quality 70 relative to quality 90 on typical screenshots
+LOW_QUALITY_SIZE_RATIO = 0.6
+# Downscales by at least this factor use the cheaper reduce + BILINEAR path instead of HAMMING
+LARGE_DOWNSCALE_FACTOR = 2.0
+# libwebp effort (0 fastest - 6 smallest); 2 is ~25% faster than the default 4 for ~2% larger files
+WEBP_METHOD = 2
+
+
+def active_window_region():
+    """
+    Returns the bounding box {left, top, width, height} of the active window,
+    using the same pygetwindow lookup as `get_active_window_title`, or None.
+    """
+    active_window = lazy_import("pygetwindow").getActiveWindow()
+    if not active_window or active_window.width <= 0 or active_window.height <= 0:
+        return None
+    return {"left": active_window.left, "top": active_window.top,
+            "width": active_window.width, "height": active_window.height}
+
+
+def parse_region(region):
+    """
+    Turns the SeeScreen `region` argument into a capture box:
+    "screen" (or empty) -> None (primary monitor), "active_window" -> the active window,
+    "x,y,width,height" -> that rectangle.
+    """
+    if not region or region == "screen":
+        return None
+    if region == "active_window":
+        return active_window_region()
+    left, top, width, height = (int(float(value)) for value in region.split(","))
+    return {"left": left, "top": top, "width": width, "height": height}
+
+
+_local = threading.local()
+_ignored_regions = ()
+
+
+def _screen_grabber():
+    """One mss instance per thread, reused across captures (mss handles are not thread-safe)."""
+    sct = getattr(_local, "sct", None)
+    if sct is None:
+        sct = _local.sct = lazy_import("mss").mss()
+    return sct
+
+
+def _encode_buffer():
+    """A per-thread BytesIO reused for every encode instead of allocating a new one per attempt."""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = BytesIO()
+    buffer.seek(0)
+    buffer.truncate()
+    return buffer
+
+
+def grab_screen(box=None):
+    """
+    Captures the primary monitor, or only `box` ({left, top, width, height}) clipped to
+    the visible desktop, and returns it as an RGB Pillow image.
+    """
+    sct = _screen_grabber()
+    if box is None:
+        area = sct.monitors[1]
+    else:
+        # Windows can be partly off-screen (or maximized with negative borders); clip to the desktop
+        desktop = sct.monitors[0]
+        left = max(box["left"], desktop["left"])
+        top = max(box["top"], desktop["top"])
+        right = min(box["left"] + box["width"], desktop["left"] + desktop["width"])
+        bottom = min(box["top"] + box["height"], desktop["top"] + desktop["height"])
+        if right <= left or bottom <= top:
+            area = sct.monitors[1]
+        else:
+            area = {"left": left, "top": top, "width": right - left, "height": bottom - top}
+    sct_img = sct.grab(area)
+    # Decode straight from mss's BGRA bytearray; `sct_img.bgra` would first copy the whole frame into bytes
+    image = raw_to_image(sct_img.raw, sct_img.size)
+    # Screen position of the capture, so frame_signature can mask the assistant's own windows
+    image.info["screen_box"] = (area["left"], area["top"], area["width"], area["height"])
+    return image
+
+
+def raw_to_image(raw, size):
+    """RGB image from a BGRA/BGRX buffer (the only full-frame copy in the pipeline)."""
+    return lazy_import("PIL.Image").frombuffer("RGB", size, raw, "raw", "BGRX", 0, 1)
+
+
+def fit_within(image, max_size):
+    """
+    Downscales the image to fit `max_size`, keeping the aspect ratio. Mild downscales use
+    HAMMING, which keeps small text about as readable as LANCZOS at half the cost; from
+    LARGE_DOWNSCALE_FACTOR on, the image is first box-reduced by an integer factor and finished
+    with BILINEAR, which is several times cheaper and loses nothing visible at that ratio.
+    """
+    Image = lazy_import("PIL.Image")
+    scale = min(max_size[0] / image.width, max_size[1] / image.height)
+    if scale >= 1:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if 1 / scale >= LARGE_DOWNSCALE_FACTOR:
+        return image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return image.resize(size, Image.Resampling.HAMMING)
+
+
+def encode_image(image, image_format="jpeg", quality=90):
+    """
+    Encodes into the thread's reusable buffer and returns it; the encoded bytes are
+    `buffer.getbuffer()[:buffer.tell()]`. "png" writes a 256-colour palette PNG.
+    """
+    Image = lazy_import("PIL.Image")
+    buffer = _encode_buffer()
+    if image_format == "webp":
+        image.save(buffer, format="WEBP", quality=quality, method=WEBP_METHOD)
+    elif image_format == "png":
+        palette = image.quantize(256, method=Image.Quantize.FASTOCTREE)
+        palette.save(buffer, format="PNG", compress_level=3)
+    else:
+        image.save(buffer, format="JPEG", quality=quality)
+    return buffer
+
+
+def to_data_url(buffer, image_format="jpeg"):
+    """Base64 data URL of the encoded buffer, encoded from a memoryview rather than a bytes copy."""
+    with buffer.getbuffer() as view:
+        encoded = base64.b64encode(view[:buffer.tell()])
+    return f"data:{IMAGE_MIME_TYPES[image_format]};base64,{encoded.decode('ascii')}"
+
+
+def encode_for_vision(image, target_bytes=TARGET_PAYLOAD_BYTES, max_size=(1920, 1080), image_format=IMAGE_FORMAT):
+    """
+    Encodes the image as a data URL close to `target_bytes`, choosing resolution and
+    quality adaptively: small captures (a single window) keep full resolution and high
+    quality, large ones are scaled down just enough to fit.
+
+    The final size and quality are picked up front from one encode of a cheap box-reduced
+    copy (encoded size scales roughly with pixel count), so a full screen is resized once
+    and usually encoded once; a second encode is made only if the estimate was too low.
+
+    Args:
+        image_format: "jpeg" (default), "webp" (~20% smaller but ~15x slower to encode) or
+                      "png" (256-colour palette, ~5x slower; lossless-looking for flat UI screenshots).
+
+    Returns:
+        (data_url, info) where info holds the final size, quality and byte count.
+    """
+    Image = lazy_import("PIL.Image")
+    # Palette PNG has no quality setting; only its resolution can be adjusted
+    high_quality = None if image_format == "png" else 90
+    low_quality = None if image_format == "png" else 70
+    fit_scale = min(1.0, max_size[0] / image.width, max_size[1] / image.height)
+    fit_pixels = image.width * image.height * fit_scale * fit_scale
+    encodes = 0
+
+    factor = int((image.width * image.height / PROBE_PIXELS) ** 0.5)
+    if factor >= 2:
+        probe = image.reduce(factor)
+        estimate = encode_image(probe, image_format, high_quality).tell() * fit_pixels / (probe.width * probe.height)
+        encodes += 1
+    else:
+        # Small enough to encode for real; most single-window captures fit straight away
+        image = fit_within(image, max_size)
+        buffer = encode_image(image, image_format, high_quality)
+        encodes += 1
+        if buffer.tell() <= target_bytes:
+            info = {"size": image.size, "format": image_format, "quality": high_quality,
+                    "bytes": buffer.tell(), "encodes": encodes}
+            return to_data_url(buffer, image_format), info
+        estimate = buffer.tell()
+        fit_scale = 1.0
+
+    quality, scale = high_quality, fit_scale
+    if estimate > target_bytes:
+        if low_quality is not None:
+            # Lowering the quality costs no readable detail, so it goes before resolution
+            quality = low_quality
+            estimate *= LOW_QUALITY_SIZE_RATIO
+        if estimate > target_bytes:
+            scale *= (target_bytes / estimate) ** 0.5
+    if scale < 1:
+        image = fit_within(image, (max(1, int(image.width * scale)), max(1, int(image.height * scale))))
+    buffer = encode_image(image, image_format, quality)
+    encodes += 1
+
+    if buffer.tell() > target_bytes:
+        # The estimate was low: shrink once more by the measured overshoot
+        scale = max(0.3, (target_bytes / buffer.tell()) ** 0.5 * 0.95)
+        new_size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(new_size, Image.Resampling.BILINEAR)
+        buffer = encode_image(image, image_format, quality)
+        encodes += 1
+
+    info = {"size": image.size, "format": image_format, "quality": quality, "bytes": buffer.tell(), "encodes": encodes}
+    return to_data_url(buffer, image_format), info
+
+
+def set_ignored_regions(boxes):
+    """
+    Screen rectangles ({left, top, width, height}) left out of frame signatures, e.g. the
+    assistant's own chat window, so typing in it does not count as a screen change.
+    """
+    global _ignored_regions
+    _ignored_regions = tuple(box for box in boxes if box)
+
+
+def frame_signature(image):
+    """A tiny grayscale thumbnail of the frame, cheap to compute and compare."""
+    Image = lazy_import("PIL.Image")
+    signature = image.convert("L").resize(SIGNATURE_SIZE, Image.Resampling.BILINEAR)
+    screen_box = image.info.get("screen_box")
+    if screen_box and _ignored_regions:
+        left, top, width, height = screen_box
+        scale_x, scale_y = SIGNATURE_SIZE[0] / width, SIGNATURE_SIZE[1] / height
+        for box in _ignored_regions:
+            # Round outwards so the window border is covered too
+            x0 = max(0, math.floor((box["left"] - left) * scale_x))
+            y0 = max(0, math.floor((box["top"] - top) * scale_y))
+            x1 = min(SIGNATURE_SIZE[0], math.ceil((box["left"] + box["width"] - left) * scale_x))
+            y1 = min(SIGNATURE_SIZE[1], math.ceil((box["top"] + box["height"] - top) * scale_y))
+            if x1 > x0 and y1 > y0:
+                signature.paste(0, (x0, y0, x1, y1))
+    return signature.tobytes()
+
+
+def changed_cells(first, second, tolerance=PIXEL_TOLERANCE):
+    """Number of signature cells that differ by more than `tolerance` gray levels."""
+    if first is None or second is None or len(first) != len(second):
+        return len(first or second or b"") or 1
+    # Identical frames are the common case
+    if first == second:
+        return 0
+    return sum(1 for a, b in zip(first, second) if abs(a - b) > tolerance)
+
+
+class ScreenDescriptionCache:
+    """
+    Remembers the last vision-model answer per `ScreenFocus` together with the frame
+    signature it was computed from. If a new capture is essentially the same frame
+    (at most `max_changed_cells` cells moved by more than `pixel_tolerance`) and the answer
+    is younger than `max_age` seconds, the cached answer is returned instead of calling
+    the vision model again.
+    """
+
+    def __init__(self, pixel_tolerance=PIXEL_TOLERANCE, max_changed_cells=MAX_CHANGED_CELLS, max_age=CACHE_MAX_AGE):
+        self.pixel_tolerance = pixel_tolerance
+        self.max_changed_cells = max_changed_cells
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # focus -> (signature, description, timestamp)
+        self._lock = threading.Lock()
+
+    def _matches(self, entry, signature):
+        cached_signature, _, timestamp = entry
+        return (time.monotonic() - timestamp <= self.max_age
+                and changed_cells(signature, cached_signature, self.pixel_tolerance) <= self.max_changed_cells)
+
+    def get(self, focus, signature):
+        with self._lock:
+            entry = self._entries.get(focus or "")
+            if entry is not None and self._matches(entry, signature):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def touch(self, focus, signature):
+        """
+        For background precomputation: if the cached answer was computed from a frame matching
+        `signature`, however long ago, marks it as fresh again and returns True (without
+        counting a hit or miss). A screen that has not changed keeps its description.
+        """
+        with self._lock:
+            entry = self._entries.get(focus or "")
+            if entry is None or changed_cells(signature, entry[0], self.pixel_tolerance) > self.max_changed_cells:
+                return False
+            self._entries[focus or ""] = (entry[0], entry[1], time.monotonic())
+            return True
+
+    def put(self, focus, signature, description):
+        with self._lock:
+            self._entries[focus or ""] = (signature, description, time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "pixel_tolerance": self.pixel_tolerance,
+                "max_changed_cells": self.max_changed_cells,
+                "max_age": self.max_age,
+            }
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from screen_capture import MAX_CHANGED_CELLS, changed_cells, set_ignored_regions
+
+# Set STEPWISE_SCREEN_WATCHER=1 to precompute screen descriptions while the chat is open
+ENABLED_BY_DEFAULT = os.environ.get("STEPWISE_SCREEN_WATCHER", "0") == "1"
+# Seconds between screen samples (stretched further when the CPU budget requires it)
+SAMPLE_INTERVAL = float(os.environ.get("STEPWISE_WATCH_INTERVAL", 1.0))
+# Share of one CPU core the watcher may use on average
+CPU_BUDGET = float(os.environ.get("STEPWISE_WATCH_CPU_BUDGET", 0.05))
+# Minimum seconds between two precomputed descriptions (each one is a vision-model call)
+MIN_DESCRIBE_INTERVAL = float(os.environ.get("STEPWISE_WATCH_DESCRIBE_INTERVAL", 15.0))
+
+
+class ScreenWatcher:
+    """
+    Samples the screen at a low rate while the chat is open and, once the screen has settled
+    on something new, precomputes a description in the background so the next `SeeScreen`
+    call can be answered from the screen cache.
+
+    A frame is described only when it is stable (unchanged since the previous sample), has
+    no fresh cached description yet, and MIN_DESCRIBE_INTERVAL has passed. The time
+    between samples is stretched so the watcher's own CPU time stays within `cpu_budget`
+    of one core. The watcher starts paused; `resume` and `pause` follow the chat window.
+
+    Args:
+        capture: Function returning (image, signature) for the current screen.
+        describe: Function called with (image, signature) to compute and cache a description.
+                  It should return False when nothing had to be done (already cached; a cached
+                  description of an unchanged screen should be kept fresh rather than redone).
+    """
+
+    def __init__(self, capture, describe, interval=SAMPLE_INTERVAL, cpu_budget=CPU_BUDGET,
+                 min_describe_interval=MIN_DESCRIBE_INTERVAL, max_changed_cells=MAX_CHANGED_CELLS):
+        self.capture = capture
+        self.describe = describe
+        self.interval = interval
+        self.cpu_budget = cpu_budget
+        self.min_describe_interval = min_describe_interval
+        self.max_changed_cells = max_changed_cells
+        self.samples = 0
+        self.descriptions = 0
+        self.errors = 0
+        self.cpu_seconds = 0.0
+        self._active = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._describing = None  # signature of the frame being described, if any
+        self._stopped = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def resume(self, ignored_regions=None):
+        """Starts (or continues) sampling. `ignored_regions` are the assistant's own windows."""
+        if ignored_regions is not None:
+            self.ignore_regions(ignored_regions)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="screen-watcher", daemon=True)
+                self._thread.start()
+        self._active.set()
+
+    def pause(self):
+        self._active.clear()
+
+    def stop(self):
+        self._stopped = True
+        self._active.set()
+
+    def ignore_regions(self, boxes):
+        """Keeps these screen rectangles ({left, top, width, height}) out of change detection."""
+        set_ignored_regions(boxes)
+
+    def wait_for(self, signature, timeout):
+        """
+        Waits up to `timeout` seconds for a description in progress, but only if it is of a
+        frame matching `signature`, so its result can be reused. Returns at once otherwise.
+        """
+        describing = self._describing
+        if describing is None or changed_cells(signature, describing) > self.max_changed_cells:
+            return False
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        previous = None
+        last_describe_time = float("-inf")
+        while True:
+            self._active.wait()
+            if self._stopped:
+                return
+            cpu_start, wall_start = time.thread_time(), time.monotonic()
+            try:
+                image, signature = self.capture()
+                self.samples += 1
+                stable = previous is not None and changed_cells(signature, previous) <= self.max_changed_cells
+                previous = signature
+                if stable and wall_start - last_describe_time >= self.min_describe_interval:
+                    self._describing = signature
+                    self._idle.clear()
+                    try:
+                        if self.describe(image, signature) is not False:
+                            self.descriptions += 1
+                            last_describe_time = time.monotonic()
+                    finally:
+                        self._describing = None
+                        self._idle.set()
+            except Exception:
+                # A failed capture or vision call must never take the assistant down; try again later
+                self.errors += 1
+            cpu = time.thread_time() - cpu_start
+            self.cpu_seconds += cpu
+            elapsed = time.monotonic() - wall_start
+            # Sleep long enough that cpu / (elapsed + sleep) stays within the budget
+            period = max(self.interval, cpu / self.cpu_budget) if self.cpu_budget > 0 else self.interval
+            time.sleep(max(0.0, period - elapsed))
+
+    def stats(self):
+        return {
+            "active": self._active.is_set(),
+            "samples": self.samples,
+            "descriptions": self.descriptions,
+            "errors": self.errors,
+            "cpu_seconds": self.cpu_seconds,
+            "cpu_budget": self.cpu_budget,
+        }
@@ -0,0 +1,12 @@
+import os
+
+# Root folder for every on-disk cache and index the assistant keeps between sessions.
+# It can be moved with the STEPWISE_DATA_DIR environment variable.
+DATA_DIR = os.environ.get("STEPWISE_DATA_DIR", os.path.join(os.path.expanduser("~"), ".stepwise_assistant"))
+
+
+def data_path(*parts):
+    """Returns a path inside DATA_DIR, creating the parent folder if needed."""
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
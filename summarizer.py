@@ -0,0 +1,131 @@
+import time
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from langchain_core.prompts import PromptTemplate
+from tool_registry import lazy_import
+
+# Content up to this many characters is summarized with a single LLM call
+SINGLE_SHOT_LIMIT = 40_000
+# Map-reduce settings: chunk size for the map step, in-flight LLM requests, summaries combined per reduce call
+CHUNK_SIZE = 8_000
+CHUNK_OVERLAP = 200
+MAX_CONCURRENCY = 4
+REDUCE_FAN_IN = 6
+
+SUMMARY_PROMPT = PromptTemplate.from_template("""
+    You are an expert summarization engine. Your task is to provide a clear and concise summary of the following content.
+
+    Focus on extracting the main ideas, key arguments, and any important conclusions.
+    Present the summary in a way that is easy to read and understand.
+
+    Content to summarize:
+    ---
+    {content}
+    ---
+
+    Concise Summary:
+    """)
+
+MAP_PROMPT = PromptTemplate.from_template("""
+    You are an expert summarization engine. The following text is one section of a longer document.
+    Summarize this section, keeping its main ideas, key facts, figures and conclusions.
+
+    Section:
+    ---
+    {content}
+    ---
+
+    Section Summary:
+    """)
+
+REDUCE_PROMPT = PromptTemplate.from_template("""
+    You are an expert summarization engine. The following are summaries of consecutive sections of one document.
+    Combine them into a single clear and concise summary of the whole document, removing repetition
+    and keeping the main ideas, key arguments, and any important conclusions.
+
+    Section summaries:
+    ---
+    {content}
+    ---
+
+    Combined Summary:
+    """)
+
+
+class MapReduceSummarizer:
+    """
+    Summarizes text with a single LLM call when it is short enough, otherwise with
+    a chunked map-reduce: chunk summaries run concurrently (at most `max_concurrency`
+    requests in flight) and are then combined hierarchically, `reduce_fan_in` at a time.
+
+    Any LangChain chat model can be passed in, so the summarizer can be timed
+    against a local fake model. `summarize` returns each call's statistics along with the
+    summary, so concurrent calls on one instance do not overwrite each other's.
+    """
+
+    def __init__(self, llm, single_shot_limit=SINGLE_SHOT_LIMIT, chunk_size=CHUNK_SIZE,
+                 chunk_overlap=CHUNK_OVERLAP, max_concurrency=MAX_CONCURRENCY, reduce_fan_in=REDUCE_FAN_IN):
+        self.llm = llm
+        self.single_shot_limit = single_shot_limit
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.max_concurrency = max_concurrency
+        self.reduce_fan_in = max(2, reduce_fan_in)
+
+    def _chain(self, prompt):
+        return {"content": RunnablePassthrough()} | prompt | self.llm | StrOutputParser()
+
+    def _run_many(self, prompt, texts):
+        # Chat models' own batch() may run the requests one after another, so use an explicit bounded pool
+        # (one that carries the caller's context, so the calls still belong to the current tool run / trace)
+        chain = self._chain(prompt)
+        with ContextThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="summarize") as pool:
+            return list(pool.map(chain.invoke, texts))
+
+    def summarize(self, content, mode="auto"):
+        """
+        Args:
+            content: The text to summarize.
+            mode: "auto" (choose by size), "single" or "map_reduce".
+
+        Returns:
+            (summary, stats): stats holds the mode used, input_chars, chunks, reduce levels,
+            llm_calls and seconds of this call.
+        """
+        start = time.perf_counter()
+        if mode == "auto":
+            mode = "single" if len(content) <= self.single_shot_limit else "map_reduce"
+
+        if mode == "single":
+            summary = self._chain(SUMMARY_PROMPT).invoke(content)
+            stats = {"mode": mode, "chunks": 1, "levels": 0, "llm_calls": 1}
+        else:
+            summary, stats = self._map_reduce(content)
+        stats["input_chars"] = len(content)
+        stats["seconds"] = time.perf_counter() - start
+        return summary, stats
+
+    def _map_reduce(self, content):
+        # Extracted text (PDF pages especially) often has no blank lines, so fall back to line,
+        # then word boundaries; otherwise the whole document would come back as one chunk
+        RecursiveCharacterTextSplitter = lazy_import("langchain.text_splitter").RecursiveCharacterTextSplitter
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap,
+                                                       separators=["\n\n", "\n", " ", ""])
+        chunks = text_splitter.split_text(content)
+
+        # Map: summarize every chunk concurrently
+        summaries = self._run_many(MAP_PROMPT, chunks)
+        llm_calls = len(chunks)
+        levels = 0
+
+        # Reduce: combine neighbouring summaries until a single one is left
+        while len(summaries) > 1:
+            groups = ["\n\n".join(summaries[i:i + self.reduce_fan_in])
+                      for i in range(0, len(summaries), self.reduce_fan_in)]
+            summaries = self._run_many(REDUCE_PROMPT, groups)
+            llm_calls += len(groups)
+            levels += 1
+
+        stats = {"mode": "map_reduce", "chunks": len(chunks), "levels": levels, "llm_calls": llm_calls}
+        return (summaries[0] if summaries else ""), stats
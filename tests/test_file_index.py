@@ -0,0 +1,45 @@
+import os
+
+from file_index import FileIndex
+
+
+def make_tree(root, files):
+    for relative in files:
+        path = os.path.join(root, *relative.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+
+def found(index, root, pattern):
+    return sorted(os.path.relpath(path, root).replace(os.sep, "/") for path in index.find(root, pattern=pattern))
+
+
+def test_new_file_is_found_right_away(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, ["docs/a.txt"])
+    index = FileIndex()
+    assert found(index, root, "*.txt") == ["docs/a.txt"]
+
+    make_tree(root, ["docs/b.txt"])
+    assert found(index, root, "*.txt") == ["docs/a.txt", "docs/b.txt"]
+    assert "- b.txt" in index.render_tree(root, depth=1)
+
+
+def test_invalidate_relists_even_with_unchanged_mtime(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, ["a.txt"])
+    index = FileIndex(refresh_interval=3600)
+    assert found(index, root, "*.txt") == ["a.txt"]
+
+    make_tree(root, ["b.txt"])
+    assert found(index, root, "*.txt") == ["a.txt"]  # trusted within the refresh interval
+    index.invalidate(root)
+    assert found(index, root, "*.txt") == ["a.txt", "b.txt"]
+
+
+def test_path_pattern_matches_at_any_depth(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, ["src/a.py", "lib/src/b.py", "lib/src/deep/c.py", "src/.hidden.py"])
+    index = FileIndex()
+    assert found(index, root, "src/*.py") == ["lib/src/b.py", "src/a.py"]
+    assert found(index, root, "lib/**/*.py") == ["lib/src/b.py", "lib/src/deep/c.py"]
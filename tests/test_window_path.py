@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from window_path import parse_window_title, path_candidates
+
+HOME = "/home/hp"
+
+# Folders and files that "exist" for these tests; nothing touches the real file system
+DIRS = {
+    "C:\\Users\\hp\\Documents\\Reports",
+    "C:\\Users\\hp\\My Projects - 2024",
+    "\\\\fileserver\\share\\team",
+    "C:\\Users\\hp\\project",
+    "C:\\Users\\hp\\src",
+    "C:\\Program Files (x86)\\Tools",
+    os.path.expanduser("~/code/app"),
+    HOME,
+    HOME + "/Downloads",
+}
+FILES = {
+    "C:\\Users\\hp\\notes\\todo.txt",
+    "C:\\Users\\hp\\project\\src\\main.py",
+    "/home/hp/code/app/server.py",
+}
+
+
+def parse(title):
+    return parse_window_title(title, is_dir=DIRS.__contains__, is_file=FILES.__contains__, home=HOME)
+
+
+@pytest.mark.parametrize("title, expected", [
+    # File Explorer with "Display the full path in the title bar"
+    ("C:\\Users\\hp\\Documents\\Reports - File Explorer", ("C:\\Users\\hp\\Documents\\Reports", "path")),
+    ("C:\\Users\\hp\\My Projects - 2024 - File Explorer", ("C:\\Users\\hp\\My Projects - 2024", "path")),
+    ("\\\\fileserver\\share\\team - Windows Explorer", ("\\\\fileserver\\share\\team", "path")),
+    ("C:\\Program Files (x86)\\Tools - File Explorer", ("C:\\Program Files (x86)\\Tools", "path")),
+    # Terminals
+    ("MINGW64:/c/Users/hp/project", ("C:\\Users\\hp\\project", "path")),
+    ("Administrator: C:\\Users\\hp\\src>", ("C:\\Users\\hp\\src", "path")),
+    ("hp@laptop: ~/code/app", (os.path.expanduser("~/code/app"), "path")),
+    # Editors showing the open file
+    ("*C:\\Users\\hp\\notes\\todo.txt - Notepad++", ("C:\\Users\\hp\\notes", "file")),
+    ("\u25cf main.py - C:\\Users\\hp\\project\\src\\main.py - Visual Studio Code", ("C:\\Users\\hp\\project\\src", "file")),
+    ("server.py (/home/hp/code/app/server.py) - gedit", ("/home/hp/code/app", "file")),
+    ("README.md (~/code/app) - gedit", (os.path.expanduser("~/code/app"), "path")),
+    # Explorer windows named after a known folder or the home folder
+    ("Downloads - File Explorer", (HOME + "/Downloads", "known_folder")),
+    ("hp - File Explorer", (HOME, "known_folder")),
+])
+def test_recorded_titles(title, expected):
+    assert parse(title) == expected
+
+
+@pytest.mark.parametrize("title", [
+    "",
+    "Spotify Premium",
+    # Shell titles name the executable, not the working directory
+    "Administrator: Command Prompt - C:\\Windows\\system32\\cmd.exe",
+    # A path that does not exist
+    "D:\\Archive\\2019 - File Explorer",
+    # A known folder name outside Explorer that does not exist under home
+    "Music - File Explorer",
+])
+def test_titles_without_a_folder(title):
+    assert parse(title) is None
+
+
+def test_candidates_longest_first_with_msys_form():
+    candidates = path_candidates("MINGW64:/c/Users/hp/My Stuff - old")
+    assert candidates[:2] == ["C:\\Users\\hp\\My Stuff - old", "/c/Users/hp/My Stuff - old"]
+    assert "C:\\Users\\hp\\My Stuff" in candidates
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import ToolMessage
+
+# Threads shared by all tool calls of a step (most tools block on disk, network or the LLM)
+TOOL_THREADS = int(os.environ.get("STEPWISE_TOOL_THREADS", 8))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _tool_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool")
+        return _pool
+
+
+class ConcurrentToolNode:
+    """
+    Graph node that runs the tool calls of the last AI message concurrently and returns
+    their ToolMessages in the order the calls were made.
+
+    Independent calls run together on a shared thread pool, with at most `limits[name]`
+    calls of the same tool at a time. Tools listed in `serial` (GUI automation, clipboard,
+    file system changes) run alone, at their position in the call list: calls before them
+    finish first and calls after them start afterwards, so their side effects happen in the
+    order the model asked for. A failing tool becomes an error ToolMessage the model can
+    react to, like in langgraph's ToolNode.
+
+    Args:
+        tools: The tools the agent can call.
+        limits: Optional {tool name: max concurrent calls}.
+        serial: Names of tools that must never run alongside another tool call.
+    """
+
+    def __init__(self, tools, limits=None, serial=()):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.serial = set(serial)
+        self._limits = {name: threading.BoundedSemaphore(limit) for name, limit in (limits or {}).items()}
+        self.last_stats = {}
+
+    def __call__(self, state, config=None):
+        tool_calls = state["messages"][-1].tool_calls
+        start = time.perf_counter()
+        durations = [0.0] * len(tool_calls)
+        results = [None] * len(tool_calls)
+
+        # Split the calls into batches: runs of independent calls, and serial calls on their own
+        batches, current = [], []
+        for index, call in enumerate(tool_calls):
+            if call["name"] in self.serial:
+                if current:
+                    batches.append(current)
+                batches.append([index])
+                current = []
+            else:
+                current.append(index)
+        if current:
+            batches.append(current)
+
+        for batch in batches:
+            if len(batch) == 1:
+                index = batch[0]
+                results[index], durations[index] = self._run(tool_calls[index], config)
+                continue
+            futures = {index: _tool_pool().submit(self._run, tool_calls[index], config) for index in batch}
+            for index, future in futures.items():
+                results[index], durations[index] = future.result()
+
+        self.last_stats = {
+            "calls": len(tool_calls),
+            "batches": len(batches),
+            "wall_seconds": time.perf_counter() - start,
+            "tool_seconds": sum(durations),
+        }
+        return {"messages": results}
+
+    def _run(self, call, config):
+        """Runs one tool call and returns (ToolMessage, seconds)."""
+        start = time.perf_counter()
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            message = ToolMessage(
+                content=f"Error: {call['name']} is not a valid tool, try one of [{', '.join(self.tools_by_name)}].",
+                name=call["name"], tool_call_id=call["id"], status="error")
+            return message, time.perf_counter() - start
+
+        limit = self._limits.get(call["name"])
+        if limit is not None:
+            limit.acquire()
+        try:
+            # Invoked with the full tool call, the tool formats its own ToolMessage (as in ToolNode)
+            message = tool.invoke({**call, "type": "tool_call"}, config)
+        except Exception as e:
+            message = ToolMessage(content=f"Error: {e!r}\n Please fix your mistakes.",
+                                  name=call["name"], tool_call_id=call["id"], status="error")
+        finally:
+            if limit is not None:
+                limit.release()
+        return message, time.perf_counter() - start
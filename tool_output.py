@@ -0,0 +1,117 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from langchain_core.tools import StructuredTool
+
+# Tool results longer than this are stored in the blob store and replaced by a preview + handle
+MAX_TOOL_OUTPUT_CHARS = int(os.environ.get("STEPWISE_TOOL_OUTPUT_CHARS", 12_000))
+PREVIEW_HEAD_CHARS = 2000
+PREVIEW_TAIL_CHARS = 800
+# Stored outputs kept per session (least recently used are evicted beyond this)
+BLOB_STORE_MAX_BYTES = 512 * 1024 * 1024
+HANDLE_PREFIX = "blob:"
+
+
+class BlobStore:
+    """
+    Session-scoped store of large tool outputs, addressed by short content handles
+    ("blob:<hash>"), so large payloads can be passed between tools without ever going
+    through the LLM. Identical outputs share a handle. Bounded by total size (LRU).
+    """
+
+    def __init__(self, max_bytes=BLOB_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._blobs = OrderedDict()  # handle -> text
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def put(self, text):
+        handle = HANDLE_PREFIX + hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()[:12]
+        with self._lock:
+            if handle in self._blobs:
+                self._blobs.move_to_end(handle)
+                return handle
+            self._blobs[handle] = text
+            self._total_bytes += len(text)
+            while self._total_bytes > self.max_bytes and len(self._blobs) > 1:
+                _, evicted = self._blobs.popitem(last=False)
+                self._total_bytes -= len(evicted)
+        return handle
+
+    def get(self, handle):
+        with self._lock:
+            text = self._blobs.get(handle)
+            if text is not None:
+                self._blobs.move_to_end(handle)
+            return text
+
+    def resolve(self, value):
+        """
+        Returns the stored text if `value` is a handle, otherwise `value` itself.
+        Raises KeyError for a handle that is unknown (or was evicted / reset).
+        """
+        if isinstance(value, str) and value.strip().startswith(HANDLE_PREFIX) and len(value.strip()) < 64:
+            text = self.get(value.strip())
+            if text is None:
+                raise KeyError(f"{value.strip()} is not a stored tool output in this session.")
+            return text
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._blobs.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"blobs": len(self._blobs), "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+
+class OutputGovernor:
+    """
+    Wraps tools so that any result longer than `max_chars` is spilled to the blob store and
+    the model only sees a preview (beginning and end) plus the handle. The handle can be
+    passed to the tools that accept one (e.g. `ask_document`, `summarize_content`) to work on
+    the full text. Wrapped tools keep their name, description and argument schema.
+    """
+
+    def __init__(self, store, max_chars=MAX_TOOL_OUTPUT_CHARS, handle_consumers=()):
+        self.store = store
+        self.max_chars = max_chars
+        self.handle_consumers = tuple(handle_consumers)
+        self.spilled = 0
+
+    def govern(self, tool_name, output):
+        text = output if isinstance(output, str) else str(output)
+        if len(text) <= self.max_chars:
+            return output
+        handle = self.store.put(text)
+        self.spilled += 1
+        consumers = " or ".join(f"`{name}`" for name in self.handle_consumers) or "a tool that accepts handles"
+        # The preview never shows more than max_chars; a smaller limit shrinks head and tail alike
+        preview = min(self.max_chars, PREVIEW_HEAD_CHARS + PREVIEW_TAIL_CHARS)
+        head = preview * PREVIEW_HEAD_CHARS // (PREVIEW_HEAD_CHARS + PREVIEW_TAIL_CHARS)
+        tail = preview - head
+        return (
+            f"[{tool_name} returned {len(text):,} characters, too much to show. The full output is stored as "
+            f"{handle}. Pass \"{handle}\" as the content argument of {consumers} to work with all of it.]\n\n"
+            f"--- beginning ---\n{text[:head]}\n"
+            f"--- ... {len(text) - head - tail:,} characters omitted ... ---\n"
+            f"--- end ---\n{text[len(text) - tail:]}"
+        )
+
+    def wrap(self, tool):
+        """Returns a tool with the same name and schema whose output is governed."""
+        def run(**kwargs):
+            # The wrapper's schema has already filled in defaults; unset optional arguments arrive
+            # as None, which the original tool's own validation would reject for `str = None` args
+            arguments = {name: value for name, value in kwargs.items() if value is not None}
+            return self.govern(tool.name, tool.invoke(arguments))
+
+        return StructuredTool.from_function(
+            func=run,
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+        )
@@ -0,0 +1,116 @@
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Load timings collected during startup and warm-up: name -> seconds
+_load_times = {}
+# Guards only the bookkeeping; imports themselves rely on Python's per-module import locks
+_load_lock = threading.Lock()
+_warm_up_thread = None
+
+
+@contextmanager
+def timed(name):
+    """Records how long the wrapped block took under the given name (first successful measurement wins)."""
+    start = time.perf_counter()
+    yield
+    with _load_lock:
+        _load_times.setdefault(name, time.perf_counter() - start)
+
+
+def lazy_import(module_name):
+    """
+    Imports a module the first time it is needed and records the import time.
+
+    Heavy dependencies of the tools (pypdf, openpyxl, mss, ...) are loaded through
+    this helper so importing `agent_and_tools` stays cheap.
+    """
+    module = sys.modules.get(module_name)
+    # A module another thread is still importing is already in sys.modules; import_module waits for it
+    if module is not None and not getattr(getattr(module, "__spec__", None), "_initializing", False):
+        return module
+    with timed(f"module: {module_name}"):
+        return importlib.import_module(module_name)
+
+
+def lazy_resource(name):
+    """
+    Decorator for zero-argument factories of expensive objects (models, clients).
+    The factory runs once, on first call, and its result is shared afterwards.
+    """
+    def decorator(factory):
+        state = {}
+        lock = threading.Lock()
+
+        def getter():
+            if "value" not in state:
+                with lock:
+                    if "value" not in state:
+                        with timed(f"resource: {name}"):
+                            state["value"] = factory()
+            return state["value"]
+
+        getter.__name__ = factory.__name__
+        getter.__doc__ = factory.__doc__
+        getter.is_loaded = lambda: "value" in state
+        return getter
+    return decorator
+
+
+def load_tool_dependencies(tool_name, dependencies):
+    """Imports the modules / resources a tool needs and records the total under the tool name."""
+    with timed(f"tool: {tool_name}"):
+        for dependency in dependencies:
+            if callable(dependency):
+                dependency()
+            else:
+                lazy_import(dependency)
+
+
+def start_warm_up(tool_dependencies, on_done=None):
+    """
+    Loads the heavy dependencies of every tool in a background daemon thread,
+    so the first real tool call usually finds everything ready.
+
+    Args:
+        tool_dependencies: Mapping of tool name -> list of module names or resource getters.
+        on_done: Optional callback invoked (from the worker thread) when warm-up finishes.
+    """
+    global _warm_up_thread
+    if _warm_up_thread is not None:
+        return _warm_up_thread
+
+    def worker():
+        for tool_name, dependencies in tool_dependencies.items():
+            try:
+                load_tool_dependencies(tool_name, dependencies)
+            except Exception as e:
+                # A missing optional dependency must not kill the warm-up; the tool will report it when called.
+                with _load_lock:
+                    _load_times.setdefault(f"tool: {tool_name} (failed: {e})", 0.0)
+        if on_done:
+            on_done()
+
+    _warm_up_thread = threading.Thread(target=worker, name="tool-warm-up", daemon=True)
+    _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def load_times():
+    """Returns a copy of the recorded load timings."""
+    with _load_lock:
+        return dict(_load_times)
+
+
+def startup_report():
+    """Formats the recorded module, resource and tool load times, slowest first."""
+    times = load_times()
+    if not times:
+        return "No load timings recorded."
+    width = max(len(name) for name in times)
+    lines = ["Startup / warm-up load times:"]
+    for name, seconds in sorted(times.items(), key=lambda item: item[1], reverse=True):
+        lines.append(f"  {name.ljust(width)}  {seconds * 1000:8.1f} ms")
+    return "\n".join(lines)
@@ -0,0 +1,314 @@
+"""
+Local tracing of agent turns.
+
+`Tracer` is a LangChain callback handler: passed in the config of `app.invoke`, it sees
+every graph node, tool call and LLM call of the turn (including the LLM calls made inside
+tools such as SeeScreen, ask_document and summarize_content) and appends one JSON line
+per span to a local trace file. Nothing is sent anywhere.
+
+Summarize the recorded traces with:
+
+    python tracing.py                  # p50 / p95 per node, tool and LLM call
+    python tracing.py --sessions 5     # only the last 5 sessions
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+from storage import data_path
+
+TRACING_ENABLED = os.environ.get("STEPWISE_TRACE", "1") == "1"
+# Default: <data dir>/traces/agent_trace.jsonl
+TRACE_FILE = os.environ.get("STEPWISE_TRACE_FILE")
+# The trace file is rotated (to <file>.1) once it grows beyond this
+TRACE_MAX_BYTES = 20 * 1024 * 1024
+
+
+def default_trace_path():
+    return TRACE_FILE or data_path("traces", "agent_trace.jsonl")
+
+
+def _size(value):
+    """Returns (characters of text, number of images) in an input or output of any shape."""
+    if value is None:
+        return 0, 0
+    if isinstance(value, str):
+        return len(value), 0
+    if isinstance(value, dict):
+        if value.get("type") == "image_url":
+            return 0, 1
+        value = value.values()
+    elif hasattr(value, "content"):
+        # Messages: their content, plus the arguments of any tool calls
+        chars, images = _size(value.content)
+        for call in getattr(value, "tool_calls", None) or ():
+            chars += len(call["name"]) + len(json.dumps(call["args"], default=str))
+        return chars, images
+    elif not isinstance(value, (list, tuple)):
+        return len(str(value)), 0
+    chars = images = 0
+    for item in value:
+        item_chars, item_images = _size(item)
+        chars += item_chars
+        images += item_images
+    return chars, images
+
+
+def _usage(response):
+    """(input tokens, output tokens) reported for an LLM call, or (None, None)."""
+    input_tokens = output_tokens = None
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens = (input_tokens or 0) + usage.get("input_tokens", 0)
+                output_tokens = (output_tokens or 0) + usage.get("output_tokens", 0)
+    return input_tokens, output_tokens
+
+
+class Tracer(BaseCallbackHandler):
+    """
+    Records a span for every graph node, tool call and LLM call of a turn, with its duration,
+    input / output size (characters, images), token counts and, for LLM calls, the time to
+    the first streamed token. The whole turn is a span of its own (kind "turn") that also
+    has the time until the agent's first token of text. Spans are buffered and appended to
+    the JSONL trace file when the turn ends; `last_turn` keeps the spans of the last turn.
+
+    Runs that are neither nodes, tools nor LLM calls (prompts, parsers, retrievers) are not
+    recorded; their children are attributed to the nearest recorded ancestor.
+    """
+
+    def __init__(self, path=None, session_id=None):
+        self.path = path or default_trace_path()
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.turn = 0
+        self.last_turn = []
+        self._spans = {}      # run id -> span of a recorded run that is still running
+        self._owner = {}      # run id -> run id of the nearest recorded run (itself if recorded)
+        self._finished = defaultdict(list)  # turn run id -> finished spans
+        self._lock = threading.Lock()
+
+    def new_session(self):
+        """Starts a new session id (e.g. after the conversation was reset)."""
+        self.session_id = uuid.uuid4().hex[:12]
+        self.turn = 0
+
+    # --- Span bookkeeping ---
+
+    def _start(self, run_id, parent_run_id, kind, name, inputs=None):
+        with self._lock:
+            owner = self._owner.get(parent_run_id)
+            parent = self._spans.get(owner)
+            if parent_run_id is None:
+                kind = "turn"
+                self.turn += 1
+            # A tool invoking a tool of the same name is a wrapper (e.g. the output governor): one span
+            if kind is None or (kind == "tool" and parent and parent["kind"] == "tool" and parent["name"] == name):
+                self._owner[run_id] = owner
+                return
+            chars, images = _size(inputs)
+            span = {
+                "session": self.session_id,
+                "turn": self.turn,
+                "span_id": str(run_id),
+                "parent_id": str(owner) if parent else None,
+                "kind": kind,
+                "name": name,
+                # The node or tool a span ran in, e.g. the tool that made an LLM call
+                "caller": (parent["name"] if parent["kind"] in ("node", "tool") else parent["caller"]) if parent else None,
+                "start": time.time(),
+                "input_chars": chars,
+                "_root": parent["_root"] if parent else run_id,
+                "_t0": time.perf_counter(),
+            }
+            if images:
+                span["input_images"] = images
+            self._spans[run_id] = span
+            self._owner[run_id] = run_id
+
+    def _end(self, run_id, outputs=None, error=None, **fields):
+        with self._lock:
+            owner = self._owner.pop(run_id, None)
+            if owner != run_id:
+                return
+            span = self._spans.pop(run_id)
+            span["duration_ms"] = round((time.perf_counter() - span.pop("_t0")) * 1000, 2)
+            span["output_chars"] = _size(outputs)[0]
+            span["status"] = "error" if error is not None else "ok"
+            if error is not None:
+                span["error"] = repr(error)[:300]
+            span.update({key: value for key, value in fields.items() if value is not None})
+            root = span.pop("_root")
+            self._finished[root].append(span)
+            if root != run_id:
+                return
+            spans = self._finished.pop(root)
+        self._finish_turn(span, spans)
+
+    def _finish_turn(self, turn, spans):
+        for kind in ("llm", "tool"):
+            turn[f"{kind}_calls"] = sum(1 for span in spans if span["kind"] == kind)
+        for key in ("input_tokens", "output_tokens"):
+            turn[key] = sum(span.get(key) or 0 for span in spans if span["kind"] == "llm")
+        self.last_turn = spans
+        self._write(spans)
+
+    def _write(self, spans):
+        lines = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > TRACE_MAX_BYTES:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as trace_file:
+                trace_file.write(lines)
+        except OSError:
+            # Tracing must never break a turn
+            pass
+
+    # --- LangChain callbacks ---
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, name=None, **kwargs):
+        # Graph nodes are the chains langgraph tags with their step
+        is_node = any(tag.startswith("graph:step:") for tag in tags or ())
+        self._start(run_id, parent_run_id, "node" if is_node else None, name, inputs)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id, outputs)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None,
+                            invocation_params=None, name=None, **kwargs):
+        params = invocation_params or {}
+        model = params.get("model") or params.get("model_name") or name or (serialized or {}).get("name")
+        self._start(run_id, parent_run_id, "llm", model, messages)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None,
+                     invocation_params=None, name=None, **kwargs):
+        params = invocation_params or {}
+        model = params.get("model") or params.get("model_name") or name or (serialized or {}).get("name")
+        self._start(run_id, parent_run_id, "llm", model, prompts)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        if not token:
+            return
+        with self._lock:
+            span = self._spans.get(run_id)
+            if span is None or "first_token_ms" in span:
+                return
+            now = time.perf_counter()
+            span["first_token_ms"] = round((now - span["_t0"]) * 1000, 2)
+            # The turn's time to first token is when the agent itself starts answering
+            turn = self._spans.get(span["_root"])
+            if span["caller"] == "process_node" and turn is not None and "first_token_ms" not in turn:
+                turn["first_token_ms"] = round((now - turn["_t0"]) * 1000, 2)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens, output_tokens = _usage(response)
+        outputs = [getattr(generation, "message", None) or generation.text
+                   for generations in response.generations for generation in generations]
+        self._end(run_id, outputs, input_tokens=input_tokens, output_tokens=output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, name=None, **kwargs):
+        self._start(run_id, parent_run_id, "tool", (serialized or {}).get("name") or name, input_str)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, output)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+
+# --- Summary CLI ---
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def load_spans(path=None, sessions=None):
+    """Reads the trace file (and its rotated predecessor); with `sessions`, only the last N sessions."""
+    path = path or default_trace_path()
+    spans = []
+    for file_path in (path + ".1", path):
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding="utf-8") as trace_file:
+            for line in trace_file:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a crash
+    if sessions:
+        order = list(dict.fromkeys(span["session"] for span in spans))
+        keep = set(order[-sessions:])
+        spans = [span for span in spans if span["session"] in keep]
+    return spans
+
+
+def summarize(spans):
+    """Groups spans into rows of latency percentiles: turns, nodes, tools and LLM calls by caller."""
+    groups = defaultdict(list)
+    for span in spans:
+        if span["kind"] == "turn":
+            key = ("turn", "total")
+        elif span["kind"] == "llm":
+            key = ("llm", f"{span.get('caller') or '-'} -> {span['name']}")
+        else:
+            key = (span["kind"], span["name"])
+        groups[key].append(span)
+        if span["kind"] == "turn" and "first_token_ms" in span:
+            groups[("turn", "first token")].append(dict(span, duration_ms=span["first_token_ms"]))
+
+    kind_order = {"turn": 0, "node": 1, "tool": 2, "llm": 3}
+    rows = []
+    for (kind, name), group in sorted(groups.items(), key=lambda item: (kind_order.get(item[0][0], 9), item[0][1])):
+        durations = [span["duration_ms"] for span in group]
+        tokens = [(span.get("input_tokens") or 0) + (span.get("output_tokens") or 0) for span in group]
+        rows.append({
+            "kind": kind,
+            "name": name,
+            "count": len(group),
+            "errors": sum(1 for span in group if span.get("status") == "error"),
+            "p50_ms": percentile(durations, 0.5),
+            "p95_ms": percentile(durations, 0.95),
+            "max_ms": max(durations),
+            "avg_tokens": sum(tokens) / len(group),
+            "avg_output_chars": sum(span.get("output_chars", 0) for span in group) / len(group),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize Stepwise Assistant agent traces (p50 / p95 latency).")
+    parser.add_argument("--file", help="trace file (default: the assistant's trace file)")
+    parser.add_argument("--sessions", type=int, help="only the last N sessions")
+    parser.add_argument("--json", action="store_true", help="print the summary rows as JSON")
+    args = parser.parse_args()
+
+    spans = load_spans(args.file, args.sessions)
+    rows = summarize(spans)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print(f"No traces in {args.file or default_trace_path()}")
+        return
+
+    sessions = len({span["session"] for span in spans})
+    print(f"{len(spans)} spans from {sessions} sessions\n")
+    print(f"  {'kind':<6}{'name':<48}{'count':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'tokens':>9}")
+    for row in rows:
+        print(f"  {row['kind']:<6}{row['name'][:47]:<48}{row['count']:>7}{row['errors']:>5}{row['p50_ms']:>10.0f}"
+              f"{row['p95_ms']:>10.0f}{row['max_ms']:>10.0f}{row['avg_tokens']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
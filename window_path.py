@@ -0,0 +1,187 @@
+import ntpath
+import os
+import posixpath
+import re
+import threading
+import time
+from tool_registry import lazy_import
+
+# Absolute Windows paths (drive or UNC) and POSIX / home-relative paths inside a window title.
+# Spaces are allowed, so a match can run into the app suffix ("C:\Docs - File Explorer");
+# candidates are therefore also tried cut at every " - " separator.
+_WINDOWS_PATH = re.compile(r'(?:[A-Za-z]:\\|\\\\[^\\/:*?"<>|\s]+\\)[^:*?"<>|\r\n]*')
+_POSIX_PATH = re.compile(r'(?:(?<=^)|(?<=[\s:(\[]))(?:~(?=/|\s|$)|/)[^\0:*?"<>|\r\n]*')
+_SEPARATOR = re.compile(r"\s+[-\u2013\u2014|]\s+")
+_CLOSING = {")": "(", "]": "["}
+# Git Bash / MSYS style drive paths: /c/Users/hp -> C:\Users\hp
+_MSYS_DRIVE = re.compile(r"^/([A-Za-z])(?=/|$)")
+
+# Title markers for unsaved or modified documents
+_TITLE_MARKERS = ("\u25cf ", "* ", "\u2022 ")
+# Titles of these shell programs name the executable, never the working directory
+_PROGRAM_SUFFIXES = (".exe", ".com", ".bat", ".cmd", ".ps1")
+KNOWN_FOLDERS = ("Desktop", "Documents", "Downloads", "Music", "Pictures", "Videos")
+EXPLORER_SUFFIXES = (" - File Explorer", " - Windows Explorer")
+TERMINAL_APPS = ("windowsterminal.exe", "openconsole.exe", "conhost.exe", "mintty.exe", "alacritty.exe", "wezterm-gui.exe")
+TERMINAL_SHELLS = ("cmd.exe", "powershell.exe", "pwsh.exe", "bash.exe", "wsl.exe", "bash", "zsh", "fish", "sh")
+
+
+def path_candidates(title):
+    """
+    Returns the path-like substrings of a window title, longest first, without touching
+    the file system. Each match is also offered cut at every " - " separator, and MSYS
+    drive paths (/c/...) are offered in their Windows form too.
+    """
+    title = title.strip()
+    for marker in _TITLE_MARKERS:
+        if title.startswith(marker):
+            title = title[len(marker):]
+    candidates = []
+    for pattern in (_WINDOWS_PATH, _POSIX_PATH):
+        for match in pattern.finditer(title):
+            text = match.group(0)
+            pieces = [text] + [text[:cut.start()] for cut in reversed(list(_SEPARATOR.finditer(text)))]
+            for piece in pieces:
+                piece = piece.strip().rstrip(">$#").rstrip()
+                # "name (path) - app": drop the closing bracket, unless the path has its own "(x86)"
+                if piece[-1:] in _CLOSING and piece.count(piece[-1]) > piece.count(_CLOSING[piece[-1]]):
+                    piece = piece[:-1]
+                if not piece:
+                    continue
+                msys = _MSYS_DRIVE.match(piece)
+                if msys:
+                    candidates.append(msys.group(1).upper() + ":\\" + piece[msys.end():].lstrip("/").replace("/", "\\"))
+                candidates.append(piece)
+    # Keep the first occurrence of each candidate
+    return list(dict.fromkeys(candidates))
+
+
+def parse_window_title(title, is_dir=os.path.isdir, is_file=os.path.isfile, home=None):
+    """
+    Works out the folder a window title points at. File system checks are injectable
+    so recorded titles can be tested without the folders existing.
+
+    Handles full paths in the title (Explorer with "full path in title bar", terminals,
+    editors showing the file path; for a file its folder is used) and Explorer windows
+    named after a known folder ("Downloads - File Explorer").
+
+    Returns:
+        (path, how) with how in {"path", "file", "known_folder"}, or None.
+    """
+    if not title:
+        return None
+    for candidate in path_candidates(title):
+        if candidate.lower().endswith(_PROGRAM_SUFFIXES):
+            continue
+        expanded = os.path.expanduser(candidate) if candidate.startswith("~") else candidate
+        if is_dir(expanded):
+            return expanded, "path"
+        if is_file(expanded):
+            # Titles recorded on Windows keep their meaning when parsed elsewhere
+            dirname = ntpath.dirname if _WINDOWS_PATH.match(expanded) else posixpath.dirname
+            return dirname(expanded), "file"
+
+    name = title.strip()
+    for suffix in EXPLORER_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)].strip()
+            break
+    home = home or os.path.expanduser("~")
+    if name in KNOWN_FOLDERS:
+        folder = os.path.join(home, name)
+        if is_dir(folder):
+            return folder, "known_folder"
+    if name == os.path.basename(home) and is_dir(home):
+        return home, "known_folder"
+    return None
+
+
+def explorer_folder(hwnd):
+    """Folder shown by the File Explorer window `hwnd`, asked through the Shell COM API (Windows, pywin32)."""
+    client = lazy_import("win32com.client")
+    for window in client.Dispatch("Shell.Application").Windows():
+        try:
+            if int(window.HWND) == int(hwnd):
+                folder = window.Document.Folder.Self.Path
+                return folder if os.path.isdir(folder) else None
+        except Exception:
+            # Internet Explorer windows and special folders have no usable path
+            continue
+    return None
+
+
+def window_process_id(hwnd):
+    """Process id owning the window `hwnd` (Windows only)."""
+    import ctypes
+    from ctypes import wintypes
+
+    pid = wintypes.DWORD()
+    ctypes.windll.user32.GetWindowThreadProcessId(wintypes.HWND(hwnd), ctypes.byref(pid))
+    return pid.value or None
+
+
+def terminal_cwd(pid):
+    """
+    Working directory of the most recently started shell in the process tree of `pid`
+    (the terminal window's process), via psutil.
+    """
+    psutil = lazy_import("psutil")
+    process = psutil.Process(pid)
+    if process.name().lower() not in TERMINAL_APPS + TERMINAL_SHELLS:
+        # Editors and other apps can host shells too, but their window is not "in" that folder
+        return None
+    shells = [child for child in [process] + process.children(recursive=True)
+              if child.name().lower() in TERMINAL_SHELLS]
+    for shell in sorted(shells, key=lambda child: child.create_time(), reverse=True):
+        try:
+            return shell.cwd()
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
+            continue
+    return None
+
+
+class CurrentDirectoryResolver:
+    """
+    Finds the folder the user is currently looking at by trying strategies in order,
+    cheapest first (window title, then OS queries, then the vision model), and keeps
+    per-strategy call counts, hit counts and latencies.
+
+    Args:
+        strategies: List of (name, function) pairs; each function returns a folder path or None.
+                    A strategy that raises (e.g. an optional dependency is missing) counts as a miss.
+    """
+
+    def __init__(self, strategies):
+        self.strategies = list(strategies)
+        self._metrics = {name: {"calls": 0, "hits": 0, "errors": 0, "seconds": 0.0, "last_seconds": 0.0}
+                         for name, _ in self.strategies}
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        """Returns (path, strategy name), or (None, None) if no strategy found a folder."""
+        for name, strategy in self.strategies:
+            start = time.perf_counter()
+            try:
+                path = strategy()
+                failed = False
+            except Exception:
+                path, failed = None, True
+            seconds = time.perf_counter() - start
+            with self._lock:
+                metrics = self._metrics[name]
+                metrics["calls"] += 1
+                metrics["errors"] += failed
+                metrics["seconds"] += seconds
+                metrics["last_seconds"] = seconds
+                if path:
+                    metrics["hits"] += 1
+            if path:
+                return path, name
+        return None, None
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: dict(metrics, average_seconds=metrics["seconds"] / metrics["calls"] if metrics["calls"] else 0.0)
+                for name, metrics in self._metrics.items()
+            }